@@ -1,11 +1,183 @@
 # Copyright (c) 2025, Your Company and contributors
 # For license information, please see license.txt
 
+import json
+import math
+
 import frappe
 from frappe import _
-from frappe.utils import nowdate, getdate, add_days, now_datetime, flt, add_months
-import statistics
-import math
+from frappe.utils import add_days, add_months, add_to_date, cint, flt, getdate, now_datetime, nowdate
+
+from erfmpnext.erfmpnext.association import DEFAULT_MAX_COUNTERS, get_pair_rules, rank_consequents
+from erfmpnext.erfmpnext.bulk import bulk_upsert, reserve_names
+from erfmpnext.erfmpnext.cache import bump_cache_version, get_cached
+from erfmpnext.erfmpnext.market_basket import mine_frequent_itemsets
+from erfmpnext.erfmpnext.orchestrator import (
+    defer_job_finish,
+    enqueue_job,
+    on_scoring_run_finished,
+    publish_progress,
+)
+from erfmpnext.erfmpnext.product_analytics import (
+    build_month_matrix,
+    classify_xyz,
+    get_month_slots,
+    summarize_monthly_sales,
+)
+from erfmpnext.erfmpnext.profiling import instrumented_job, stage
+from erfmpnext.erfmpnext.quantiles import QuantileSketch
+from erfmpnext.erfmpnext.scoring import (
+    get_invoice_days_late,
+    get_invoice_payment_features,
+    score_array,
+    score_value,
+    summarize_days_late,
+)
+
+# Customers scored, written and committed together in calculate_rfm_scores
+SCORE_CHUNK_SIZE = 1000
+
+# Background job timeout (seconds) for run_rfm_scoring
+RFM_SCORING_JOB_TIMEOUT = 4 * 60 * 60
+
+# Interrupted scoring runs older than this start over instead of resuming
+SCORING_RESUME_WINDOW_HOURS = 24
+
+# Cache namespace of get_dashboard_summary
+DASHBOARD_CACHE = "dashboard"
+
+# Cache namespace of get_product_matrix, bumped by calculate_product_analytics
+PRODUCT_CACHE = "product_analytics"
+
+# Cells of the ABC/XYZ matrix
+ABC_CATEGORIES = ("A", "B", "C")
+XYZ_CATEGORIES = ("X", "Y", "Z")
+
+# Cache namespace of the threshold simulator's feature vectors, bumped by full scoring runs
+FEATURES_CACHE = "rfm_features"
+
+# Average-score buckets shared by the segment distribution and rollups
+SEGMENT_LABELS = {
+    5: "Excellent (5)",
+    4: "Good (4)",
+    3: "Average (3)",
+    2: "Fair (2)",
+    1: "Poor (1)",
+}
+
+# RFM History rows per bulk insert in create_history_snapshot
+SNAPSHOT_CHUNK_SIZE = 5000
+
+# Items saved between two progress messages of calculate_product_analytics
+PROGRESS_INTERVAL = 100
+
+# Customer RFM Features columns written by write_customer_features
+CUSTOMER_FEATURE_FIELDS = (
+    "customer", "customer_name", "last_purchase_date", "order_count", "total_spent",
+    "payment_terms_days", "settled_days_late", "open_due_dates", "features_updated_on",
+)
+
+# Auto Quantile cut points: the best 20% of customers score 5, the next 20% score 4, ...
+QUANTILE_CUT_POINTS = (0.2, 0.4, 0.6, 0.8)
+
+# Auto Quantile sketches: dimension -> (threshold field prefix, higher is better, lowest allowed threshold)
+# A zero recency/frequency/monetary threshold would fall back to its default in get_rfm_thresholds
+QUANTILE_DIMENSIONS = {
+    "recency": ("recency_days", False, 1),
+    "frequency": ("frequency_orders", True, 1),
+    "monetary": ("monetary_amount", True, 0.01),
+    "payment": ("payment_days", False, None),
+}
+
+# Most recent alerts listed in the alert digest email
+ALERT_DIGEST_ROWS = 50
+
+# Item Basket Analysis rows per bulk insert in calculate_market_basket
+BASKET_RULE_CHUNK_SIZE = 5000
+
+# Recommendations ranked per item when RFM Settings leaves it unset
+DEFAULT_RECOMMENDATION_TOP_K = 10
+
+# Customer RFM Score columns written by write_rfm_scores
+RFM_SCORE_FIELDS = (
+    "customer", "customer_name", "recency_score", "frequency_score", "monetary_score",
+    "payment_score", "total_score", "average_score", "previous_average", "score_changed_on",
+    "last_purchase_date", "days_since_purchase", "total_orders", "total_spent",
+    "payment_terms_days", "avg_days_to_pay", "avg_days_late", "on_time_payments",
+    "late_payments", "last_calculated",
+)
+
+# Hot queries, shared with the EXPLAIN diagnostic in indexes.get_analytics_queries
+
+# Customers with their windowed Customer Monthly Facts, by name (scoring runs checkpoint
+# the last customer of each chunk); {condition} filters customers
+CUSTOMER_AGGREGATES_QUERY = """
+    SELECT
+        c.name as customer,
+        c.customer_name,
+        COALESCE(MAX(f.last_purchase_date), (
+            SELECT lf.last_purchase_date
+            FROM `tabCustomer Monthly Fact` lf
+            WHERE lf.customer = c.name
+            ORDER BY lf.month DESC
+            LIMIT 1
+        )) as last_purchase_date,
+        SUM(f.order_count) as total_orders,
+        SUM(f.total_spent) as total_spent
+    FROM `tabCustomer` c
+    LEFT JOIN `tabCustomer Monthly Fact` f ON f.customer = c.name
+        AND f.month >= %(window_start)s
+    {condition}
+    GROUP BY c.name, c.customer_name
+    ORDER BY c.name
+"""
+
+# All submitted invoices (not returns) of a batch of customers
+PAYMENT_INVOICES_QUERY = """
+    SELECT
+        si.customer,
+        si.name,
+        si.posting_date,
+        si.due_date,
+        si.grand_total,
+        si.outstanding_amount
+    FROM `tabSales Invoice` si
+    WHERE si.customer IN %(customers)s
+        AND si.docstatus = 1
+        AND si.is_return = 0
+"""
+
+# Latest payment date of every fully paid invoice of a batch of customers
+LAST_PAYMENT_DATES_QUERY = """
+    SELECT per.reference_name, MAX(pe.posting_date) as paid_date
+    FROM `tabPayment Entry Reference` per
+    JOIN `tabPayment Entry` pe ON per.parent = pe.name
+    JOIN `tabSales Invoice` si ON si.name = per.reference_name
+    WHERE si.customer IN %(customers)s
+        AND si.docstatus = 1
+        AND si.is_return = 0
+        AND si.outstanding_amount <= 0.1
+        AND pe.docstatus = 1
+    GROUP BY per.reference_name
+"""
+
+# Anti-join: scores of customers without a snapshot for %(today)s
+HISTORY_SNAPSHOT_QUERY = """
+    SELECT
+        s.customer, s.recency_score, s.frequency_score, s.monetary_score,
+        s.payment_score, s.average_score
+    FROM `tabCustomer RFM Score` s
+    LEFT JOIN `tabRFM History` h ON h.customer = s.customer AND h.snapshot_date = %(today)s
+    WHERE h.name IS NULL
+"""
+
+# Item x month sales cube from %(window_start)s on
+PRODUCT_SALES_QUERY = """
+    SELECT item_code, month, revenue, qty, invoice_count
+    FROM `tabItem Monthly Sales`
+    WHERE month >= %(window_start)s
+    ORDER BY item_code, month
+"""
 
 
 def get_score_from_thresholds(value, thresholds, reverse=False):
@@ -14,19 +186,9 @@ def get_score_from_thresholds(value, thresholds, reverse=False):
     thresholds = list of 4 values for scores 5 down to 2
     If reverse=True, higher value = higher score (for frequency/monetary)
     If reverse=False, lower value = higher score (for recency/payment)
+    Scalar wrapper around the columnar kernel in scoring.py.
     """
-    if reverse:
-        # Higher value = higher score (frequency, monetary)
-        for i, threshold in enumerate(thresholds):
-            if value >= threshold:
-                return 5 - i
-        return 1
-    else:
-        # Lower value = higher score (recency, payment days late)
-        for i, threshold in enumerate(thresholds):
-            if value <= threshold:
-                return 5 - i
-        return 1
+    return score_value(value, thresholds, reverse)
 
 
 def get_payment_terms_days(customer):
@@ -34,138 +196,658 @@ def get_payment_terms_days(customer):
     payment_terms = frappe.db.get_value("Customer", customer, "payment_terms")
     if not payment_terms:
         return 0
-    
+
     # Get the first row's credit days from the payment terms template
     credit_days = frappe.db.get_value(
         "Payment Terms Template Detail",
         {"parent": payment_terms},
-        "credit_days"
+        "credit_days",
+        order_by="idx asc"
     )
     return credit_days or 0
 
 
-@frappe.whitelist()
+def get_rfm_thresholds(settings):
+    """Build threshold lists from settings (Only 4 thresholds needed for 1-5 scale)"""
+    return frappe._dict({
+        "recency": [
+            settings.recency_days_5 or 30,
+            settings.recency_days_4 or 60,
+            settings.recency_days_3 or 90,
+            settings.recency_days_2 or 180,
+        ],
+        "frequency": [
+            settings.frequency_orders_5 or 10,
+            settings.frequency_orders_4 or 5,
+            settings.frequency_orders_3 or 3,
+            settings.frequency_orders_2 or 2,
+        ],
+        "monetary": [
+            flt(settings.monetary_amount_5) or 50000,
+            flt(settings.monetary_amount_4) or 25000,
+            flt(settings.monetary_amount_3) or 10000,
+            flt(settings.monetary_amount_2) or 2000,
+        ],
+        "payment": [
+            settings.payment_days_5 if settings.payment_days_5 is not None else -7,
+            settings.payment_days_4 if settings.payment_days_4 is not None else 7,
+            settings.payment_days_3 if settings.payment_days_3 is not None else 30,
+            settings.payment_days_2 if settings.payment_days_2 is not None else 60,
+        ],
+    })
+
+
+def get_threshold_mode():
+    return frappe.db.get_single_value("RFM Settings", "threshold_mode") or "Manual"
+
+
+def is_auto_quantile(run=None):
+    """Whether thresholds are Auto Quantile: for a scoring run, as snapshotted when it was created"""
+    return (run.threshold_mode if run else get_threshold_mode()) == "Auto Quantile"
+
+
+def new_threshold_sketches():
+    return {dimension: QuantileSketch() for dimension in QUANTILE_DIMENSIONS}
+
+
+def load_threshold_sketches(data):
+    """Threshold sketches from their JSON checkpoint (fresh sketches when there is none)"""
+    data = frappe.parse_json(data) if isinstance(data, str) else (data or {})
+    return {dimension: QuantileSketch.from_dict(data.get(dimension) or {}) for dimension in QUANTILE_DIMENSIONS}
+
+
+def dump_threshold_sketches(sketches):
+    return json.dumps({dimension: sketch.as_dict() for dimension, sketch in sketches.items()}, separators=(",", ":"))
+
+
+def merge_threshold_sketches(checkpoints):
+    """Merge the threshold sketch checkpoints of several (shard) runs"""
+    sketches = new_threshold_sketches()
+    for checkpoint in checkpoints:
+        for dimension, sketch in load_threshold_sketches(checkpoint).items():
+            sketches[dimension].merge(sketch)
+    return sketches
+
+
+def add_to_threshold_sketches(sketches, rows, payment_features, today):
+    """
+    Add a scored chunk to the threshold sketches: days since purchase of customers
+    who ever bought, orders and spend of customers who bought in the analysis
+    period, and the days late of every mature invoice (the payment thresholds
+    score invoices, not customers).
+    """
+    for row in rows:
+        if row["last_purchase_date"]:
+            sketches["recency"].add(row["days_since_purchase"])
+        if row["total_orders"]:
+            sketches["frequency"].add(row["total_orders"])
+            sketches["monetary"].add(flt(row["total_spent"]))
+        for days_late in get_invoice_days_late(payment_features[row["customer"]], today):
+            sketches["payment"].add(days_late)
+
+
+def get_quantile_thresholds(sketches):
+    """RFM Settings threshold values at the quintile cut points of the sketches (empty ones are left out)"""
+    values = {}
+    for dimension, (prefix, reverse, minimum) in QUANTILE_DIMENSIONS.items():
+        sketch = sketches[dimension]
+        if not sketch.count:
+            continue
+
+        cut_points = reversed(QUANTILE_CUT_POINTS) if reverse else QUANTILE_CUT_POINTS
+        for score, q in zip((5, 4, 3, 2), cut_points, strict=True):
+            value = sketch.quantile(q)
+            value = flt(value, 2) if dimension == "monetary" else round(value)
+            if minimum is not None:
+                value = max(value, minimum)
+            values[f"{prefix}_{score}"] = value
+    return values
+
+
+def apply_quantile_thresholds(sketches):
+    """
+    Store the sketches' cut points and computation time in RFM Settings. If any
+    threshold moved, the settings hook queues a rescore from the stored features,
+    which runs once the calling scoring job releases the scoring lock.
+    """
+    values = get_quantile_thresholds(sketches)
+    if not values:
+        return
+
+    settings = frappe.get_single("RFM Settings")
+    settings.update(values)
+    settings.thresholds_computed_on = now_datetime()
+    settings.save(ignore_permissions=True)
+    frappe.db.commit()
+
+
+def get_customer_aggregates(customers=None, period_start=None):
+    """
+    Get customers with their invoice data, limited to `customers` when given.
+    Orders and spend are summed over the Customer Monthly Facts from the month of
+    `period_start` on; customers without purchases in the window keep their
+    latest purchase date for recency.
+    """
+    if customers is not None and not customers:
+        return []
+
+    condition = "WHERE c.name IN %(customers)s" if customers else ""
+    return frappe.db.sql(CUSTOMER_AGGREGATES_QUERY.format(condition=condition), {
+        "customers": customers,
+        "window_start": getdate(period_start or "1900-01-01").replace(day=1),
+    }, as_dict=True)
+
+
+@instrumented_job("calculate_rfm_scores")
 def calculate_rfm_scores():
     """Calculate RFMP scores for all customers based on Sales Invoices"""
+    started_on = now_datetime()
+    sketches = new_threshold_sketches() if is_auto_quantile() else None
+    results = score_customers(sketches=sketches)
+    if sketches:
+        apply_quantile_thresholds(sketches)
+    invalidate_feature_vectors()
+    enqueue_alert_digest(started_on)
+    return results
+
+
+@instrumented_job("rescore_from_features")
+def rescore_from_features():
+    """
+    Rescore every customer with the current thresholds from the Customer RFM Features
+    store alone, without reading invoices or payments (e.g. after a settings change).
+    Customers missing from the store (e.g. created since the last scoring run, or
+    all of them before the first one) are scored from invoices.
+    """
+    started_on = now_datetime()
+    results = score_customers(from_features=True)
+
+    missing = frappe.db.sql_list("""
+        SELECT c.name
+        FROM `tabCustomer` c
+        LEFT JOIN `tabCustomer RFM Features` crf ON crf.name = c.name
+        WHERE crf.name IS NULL
+        ORDER BY c.name
+    """)
+    for start in range(0, len(missing), SCORE_CHUNK_SIZE):
+        chunk_results = score_customers(missing[start:start + SCORE_CHUNK_SIZE])
+        results["processed"] += chunk_results["processed"]
+        results["alerts_created"] += chunk_results["alerts_created"]
+
+    enqueue_alert_digest(started_on)
+    return results
+
+
+def score_customers(customers=None, on_chunk=None, from_features=False, sketches=None):
+    """
+    Calculate RFMP scores for `customers` (all customers when None).
+    Commits once per chunk; `on_chunk(chunk_customers, chunk_results)` runs just
+    before each commit so callers can checkpoint in the same transaction.
+    Scoring from invoices refreshes the customers' Customer RFM Features;
+    `from_features` scores from those stored features instead.
+    Every chunk is added to the Auto Quantile threshold `sketches` when given.
+    """
     settings = frappe.get_single("RFM Settings")
     today = getdate(nowdate())
-    period_start = add_days(today, -settings.analysis_period_days or -365)
-    
-    # Build threshold lists from settings (Only 4 thresholds needed for 1-5 scale)
-    recency_thresholds = [
-        settings.recency_days_5 or 30,
-        settings.recency_days_4 or 60,
-        settings.recency_days_3 or 90,
-        settings.recency_days_2 or 180,
-    ]
-    
-    frequency_thresholds = [
-        settings.frequency_orders_5 or 10,
-        settings.frequency_orders_4 or 5,
-        settings.frequency_orders_3 or 3,
-        settings.frequency_orders_2 or 2,
-    ]
-    
-    monetary_thresholds = [
-        flt(settings.monetary_amount_5) or 50000,
-        flt(settings.monetary_amount_4) or 25000,
-        flt(settings.monetary_amount_3) or 10000,
-        flt(settings.monetary_amount_2) or 2000,
-    ]
-    
-    payment_thresholds = [
-        settings.payment_days_5 if settings.payment_days_5 is not None else -7,
-        settings.payment_days_4 if settings.payment_days_4 is not None else 7,
-        settings.payment_days_3 if settings.payment_days_3 is not None else 30,
-        settings.payment_days_2 if settings.payment_days_2 is not None else 60,
-    ]
-    
-    # Get all customers with their invoice data
-    customer_data = frappe.db.sql("""
-        SELECT 
-            c.name as customer,
-            c.customer_name,
-            MAX(si.posting_date) as last_purchase_date,
-            COUNT(DISTINCT si.name) as total_orders,
-            SUM(si.grand_total) as total_spent
-        FROM `tabCustomer` c
-        LEFT JOIN `tabSales Invoice` si ON si.customer = c.name 
-            AND si.docstatus = 1 
-        GROUP BY c.name, c.customer_name
-    """, as_dict=True)
-    
-    results = {"processed": 0, "alerts_created": 0}
-    
-    for cust in customer_data:
-        # Calculate days since last purchase
-        if cust.last_purchase_date:
-            days_since = (today - getdate(cust.last_purchase_date)).days
+    period_start = add_days(today, -(cint(settings.analysis_period_days) or 365))
+
+    thresholds = get_rfm_thresholds(settings)
+    payment_thresholds = thresholds.payment
+
+    with stage("customer_aggregates") as metrics:
+        if from_features:
+            customer_data = get_customer_features(customers)
         else:
-            days_since = 9999  # Never purchased
-        
-        # Calculate R score
-        r_score = get_score_from_thresholds(days_since, recency_thresholds, reverse=False)
-        
-        # Calculate F score
-        f_score = get_score_from_thresholds(cust.total_orders or 0, frequency_thresholds, reverse=True)
-        
-        # Calculate M score
-        m_score = get_score_from_thresholds(flt(cust.total_spent) or 0, monetary_thresholds, reverse=True)
-        
+            customer_data = get_customer_aggregates(customers, period_start)
+        metrics["rows"] = len(customer_data)
+
+    results = {"processed": 0, "alerts_created": 0}
+
+    for start in range(0, len(customer_data), SCORE_CHUNK_SIZE):
+        chunk = customer_data[start:start + SCORE_CHUNK_SIZE]
+
+        # Score payments for the whole chunk in a few grouped queries
+        chunk_customers = [c.customer for c in chunk]
+        with stage("payment_scoring") as metrics:
+            if from_features:
+                payment_features = {c.customer: c.payment_features for c in chunk}
+            else:
+                payment_features = get_payment_features(chunk_customers)
+            payment_map = score_payment_features(chunk_customers, payment_features, payment_thresholds, today)
+            metrics["rows"] = len(chunk)
+
+        with stage("rfm_scoring") as metrics:
+            rows = score_chunk(chunk, payment_map, today, thresholds)
+            metrics["rows"] = len(rows)
+
+        if sketches:
+            with stage("quantile_sketches") as metrics:
+                add_to_threshold_sketches(sketches, rows, payment_features, today)
+                metrics["rows"] = len(rows)
+
+        # Persist the chunk and raise alerts for significant score changes
+        with stage("save_scores") as metrics:
+            changes = write_rfm_scores(rows, today)
+            if not from_features:
+                write_customer_features(chunk, payment_features)
+            metrics["rows"] = len(rows)
+
+        chunk_results = {"processed": len(rows), "alerts_created": 0}
+        with stage("alerting") as metrics:
+            events = []
+            for customer, old_average, average_score in changes:
+                if settings.alert_on_downgrade and average_score < old_average:
+                    events.append((customer, "Downgrade", old_average, average_score))
+                elif average_score > old_average:
+                    events.append((customer, "Upgrade", old_average, average_score))
+            customer_names = {row["customer"]: row["customer_name"] for row in rows}
+            chunk_results["alerts_created"] = write_alerts(events, customer_names)
+            metrics["rows"] = chunk_results["alerts_created"]
+
+        with stage("commit"):
+            if on_chunk:
+                on_chunk(chunk_customers, chunk_results)
+
+            frappe.db.commit()
+        results["processed"] += chunk_results["processed"]
+        results["alerts_created"] += chunk_results["alerts_created"]
+
+    if customer_data:
+        invalidate_dashboard_cache()
+
+    return results
+
+
+def get_customer_features(customers=None):
+    """Customer RFM Features rows shaped like get_customer_aggregates, plus their payment_features"""
+    if customers is not None and not customers:
+        return []
+
+    condition = "WHERE customer IN %(customers)s" if customers else ""
+    rows = frappe.db.sql(f"""
+        SELECT
+            customer, customer_name, last_purchase_date,
+            order_count as total_orders, total_spent,
+            payment_terms_days, settled_days_late, open_due_dates
+        FROM `tabCustomer RFM Features`
+        {condition}
+        ORDER BY customer
+    """, {"customers": customers}, as_dict=True)
+
+    for row in rows:
+        row.payment_features = {
+            "payment_terms_days": row.pop("payment_terms_days") or 0,
+            "settled_days_late": frappe.parse_json(row.pop("settled_days_late") or "{}"),
+            "open_due_dates": frappe.parse_json(row.pop("open_due_dates") or "{}"),
+        }
+    return rows
+
+
+def write_customer_features(chunk, payment_features):
+    """Upsert the Customer RFM Features of a chunk of customer aggregates (no commit)"""
+    now = now_datetime()
+    bulk_upsert("Customer RFM Features", [
+        {
+            "name": cust.customer,
+            "customer": cust.customer,
+            "customer_name": cust.customer_name,
+            "last_purchase_date": cust.last_purchase_date,
+            "order_count": cust.total_orders or 0,
+            "total_spent": cust.total_spent or 0,
+            "payment_terms_days": payment_features[cust.customer]["payment_terms_days"],
+            "settled_days_late": json.dumps(payment_features[cust.customer]["settled_days_late"], separators=(",", ":")),
+            "open_due_dates": json.dumps(payment_features[cust.customer]["open_due_dates"], separators=(",", ":")),
+            "features_updated_on": now,
+        }
+        for cust in chunk
+    ], CUSTOMER_FEATURE_FIELDS)
+
+
+def score_chunk(chunk, payment_map, today, thresholds):
+    """Customer RFM Score rows of a chunk of customer aggregates"""
+    rows = []
+
+    # Calculate days since last purchase
+    days_since = [
+        (today - getdate(cust.last_purchase_date)).days if cust.last_purchase_date else 9999  # Never purchased
+        for cust in chunk
+    ]
+
+    # Calculate R, F and M scores for the whole chunk
+    r_scores = score_array(days_since, thresholds.recency, reverse=False)
+    f_scores = score_array([cust.total_orders or 0 for cust in chunk], thresholds.frequency, reverse=True)
+    m_scores = score_array([flt(cust.total_spent) or 0 for cust in chunk], thresholds.monetary, reverse=True)
+
+    for j, cust in enumerate(chunk):
+        r_score = int(r_scores[j])
+        f_score = int(f_scores[j])
+        m_score = int(m_scores[j])
+
         # Calculate Payment score
-        payment_data = calculate_payment_score_per_invoice(cust.customer, payment_thresholds)
+        payment_data = payment_map[cust.customer]
         p_score = payment_data['p_score']
-        
+
         # Calculate totals
         total_score = r_score + f_score + m_score + p_score
         average_score = round(total_score / 4, 1)
-        
-        # Get or create Customer RFM Score record
-        existing = frappe.db.exists("Customer RFM Score", cust.customer)
-        
-        if existing:
-            doc = frappe.get_doc("Customer RFM Score", cust.customer)
-            old_average = doc.average_score or 0
-        else:
-            doc = frappe.new_doc("Customer RFM Score")
-            doc.customer = cust.customer
-            old_average = 0
-        
-        # Update scores
-        doc.recency_score = r_score
-        doc.frequency_score = f_score
-        doc.monetary_score = m_score
-        doc.payment_score = p_score
-        doc.total_score = total_score
-        doc.average_score = average_score
-        doc.last_purchase_date = cust.last_purchase_date
-        doc.days_since_purchase = days_since if days_since < 9999 else None
-        doc.total_orders = cust.total_orders or 0
-        doc.total_spent = cust.total_spent or 0
-        doc.payment_terms_days = payment_data['payment_terms_days']
-        doc.avg_days_to_pay = payment_data['avg_days_to_pay']
-        doc.avg_days_late = payment_data['avg_days_late']
-        doc.on_time_payments = payment_data['on_time_payments']
-        doc.late_payments = payment_data['late_payments']
-        doc.last_calculated = now_datetime()
-        
-        # Check for significant score change
-        if old_average and abs(old_average - average_score) >= 0.5: # More sensitive for small scale
-            doc.previous_average = old_average
-            doc.score_changed_on = today
-            
-            # Create alert if enabled
-            if settings.alert_on_downgrade and average_score < old_average:
-                create_alert(cust.customer, "Downgrade", f"{old_average}", f"{average_score}")
-                results["alerts_created"] += 1
-            elif average_score > old_average:
-                create_alert(cust.customer, "Upgrade", f"{old_average}", f"{average_score}")
-        
-        doc.save(ignore_permissions=True)
-        results["processed"] += 1
-    
+
+        rows.append({
+            "name": cust.customer,
+            "customer": cust.customer,
+            "customer_name": cust.customer_name,
+            "recency_score": r_score,
+            "frequency_score": f_score,
+            "monetary_score": m_score,
+            # Int columns: truncated as Document.save cast them, average_score keeps the fractional P
+            "payment_score": cint(p_score),
+            "total_score": cint(total_score),
+            "average_score": average_score,
+            "last_purchase_date": cust.last_purchase_date,
+            "days_since_purchase": days_since[j] if days_since[j] < 9999 else None,
+            "total_orders": cust.total_orders or 0,
+            "total_spent": cust.total_spent or 0,
+            "payment_terms_days": payment_data['payment_terms_days'],
+            "avg_days_to_pay": payment_data['avg_days_to_pay'],
+            "avg_days_late": payment_data['avg_days_late'],
+            "on_time_payments": payment_data['on_time_payments'],
+            "late_payments": payment_data['late_payments'],
+            "last_calculated": now_datetime(),
+        })
+
+    return rows
+
+
+@frappe.whitelist()
+def enqueue_rfm_scoring(resume=True):
+    """
+    Run the chunked, resumable RFM scoring job on the long queue. Returns its job id;
+    progress is published as orchestrator.PROGRESS_EVENT realtime messages.
+    """
+    return enqueue_job("rfm_reconciliation", resume=frappe.parse_json(resume))
+
+
+@frappe.whitelist()
+def enqueue_product_analytics():
+    """Run calculate_product_analytics on the long queue; returns its job id"""
+    return enqueue_job("product_analytics")
+
+
+@instrumented_job("run_rfm_scoring")
+def run_rfm_scoring(resume=True, chunk_size=SCORE_CHUNK_SIZE):
+    """
+    Job mode of calculate_rfm_scores. Walks customers in keyset order, commits
+    every chunk and checkpoints it in an RFM Scoring Run, so a run interrupted by
+    a timeout or deadlock resumes after its last committed customer.
+    With `scoring_shards` > 1 in RFM Settings the customers are split into hash
+    shards, each scored by its own worker and checkpointed in its own shard run.
+    """
+    run = get_resumable_scoring_run() if resume else None
+    if not run:
+        run = create_scoring_run(cint(frappe.db.get_single_value("RFM Settings", "scoring_shards")) or 1)
+
+    if (run.shard_count or 1) > 1:
+        return dispatch_scoring_shards(run, chunk_size)
+
+    execute_scoring_run(run, chunk_size)
+    return {"run": run.name, "processed": run.processed, "alerts_created": run.alerts_created}
+
+
+def create_scoring_run(shard_count=1):
+    """Create a coordinator RFM Scoring Run and, when sharded, one child run per shard"""
+    run = frappe.new_doc("RFM Scoring Run")
+    run.shard_count = shard_count
+    run.total_customers = frappe.db.count("Customer")
+    run.threshold_mode = get_threshold_mode()
+    run.insert(ignore_permissions=True)
+
+    if shard_count > 1:
+        shard_sizes = dict(frappe.db.sql("""
+            SELECT CRC32(name) %% %(shards)s as shard, COUNT(*)
+            FROM `tabCustomer`
+            GROUP BY shard
+        """, {"shards": shard_count}))
+
+        for shard_index in range(shard_count):
+            shard = frappe.new_doc("RFM Scoring Run")
+            shard.parent_run = run.name
+            shard.shard_index = shard_index
+            shard.shard_count = shard_count
+            shard.total_customers = shard_sizes.get(shard_index, 0)
+            shard.threshold_mode = run.threshold_mode
+            shard.insert(ignore_permissions=True)
+
     frappe.db.commit()
-    return results
+    return run
+
+
+def execute_scoring_run(run, chunk_size=SCORE_CHUNK_SIZE):
+    """Score the customers of one (shard) run chunk by chunk, resuming from its checkpoint"""
+    run.db_set({"status": "Running", "started_on": run.started_on or now_datetime(), "error": None})
+    frappe.db.commit()
+
+    shard_condition = ""
+    if run.parent_run:
+        shard_condition = "AND CRC32(name) %% %(shard_count)s = %(shard_index)s"
+
+    # Sketches are checkpointed with every chunk, so a resumed run counts each customer once
+    sketches = load_threshold_sketches(run.quantile_sketches) if is_auto_quantile(run) else None
+
+    def checkpoint(chunk_customers, chunk_results):
+        run.processed = (run.processed or 0) + chunk_results["processed"]
+        run.alerts_created = (run.alerts_created or 0) + chunk_results["alerts_created"]
+        run.last_customer = chunk_customers[-1]
+        values = {
+            "processed": run.processed,
+            "alerts_created": run.alerts_created,
+            "last_customer": run.last_customer,
+        }
+        if sketches:
+            values["quantile_sketches"] = dump_threshold_sketches(sketches)
+        run.db_set(values, update_modified=False)
+        publish_scoring_progress(run)
+
+    try:
+        while True:
+            customers = frappe.db.sql_list(f"""
+                SELECT name FROM `tabCustomer`
+                WHERE name > %(last_customer)s
+                    {shard_condition}
+                ORDER BY name
+                LIMIT %(limit)s
+            """, {
+                "last_customer": run.last_customer or "",
+                "shard_count": run.shard_count,
+                "shard_index": run.shard_index,
+                "limit": chunk_size,
+            })
+
+            if not customers:
+                break
+
+            score_customers(customers, on_chunk=checkpoint, sketches=sketches)
+    except Exception:
+        frappe.db.rollback()
+        run.db_set({"status": "Failed", "error": frappe.get_traceback()})
+        frappe.db.commit()
+        raise
+
+    run.db_set({"status": "Completed", "finished_on": now_datetime()})
+    frappe.db.commit()
+
+    # Shards leave thresholds and the digest to their coordinator run
+    if not run.parent_run:
+        if sketches:
+            apply_quantile_thresholds(sketches)
+        invalidate_feature_vectors()
+        enqueue_alert_digest(run.started_on)
+
+
+def publish_scoring_progress(run):
+    """Publish scoring progress; shards report the totals of their coordinator run"""
+    processed, total = run.processed, run.total_customers
+    if run.parent_run:
+        processed, total = frappe.db.sql("""
+            SELECT SUM(processed), SUM(total_customers)
+            FROM `tabRFM Scoring Run`
+            WHERE parent_run = %s
+        """, run.parent_run)[0]
+    # Shard jobs run outside the orchestrator; their progress belongs to the reconciliation
+    job = getattr(frappe.local, "erfmpnext_job", None) or "rfm_reconciliation"
+    publish_progress(_("Scoring customers"), processed, total, job=job)
+
+
+def dispatch_scoring_shards(run, chunk_size=SCORE_CHUNK_SIZE):
+    """Start every unfinished shard of a coordinator run as a long-queue job or in a local process pool"""
+    shards = frappe.get_all(
+        "RFM Scoring Run",
+        filters={"parent_run": run.name, "status": ["!=", "Completed"]},
+        pluck="name",
+    )
+    run.db_set({"status": "Running", "started_on": run.started_on or now_datetime(), "error": None})
+    frappe.db.commit()
+
+    if not shards:
+        # Every shard already finished (e.g. a resumed run that stopped before finalizing)
+        return finalize_sharded_run(run.name)
+
+    if frappe.db.get_single_value("RFM Settings", "shard_execution") == "Process Pool":
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        # Spawned (not forked) workers open their own site connection
+        with ProcessPoolExecutor(max_workers=len(shards) or 1, mp_context=get_context("spawn")) as pool:
+            futures = [
+                pool.submit(run_scoring_shard_in_process, frappe.local.site, frappe.local.sites_path, shard, chunk_size)
+                for shard in shards
+            ]
+        errors = [f.exception() for f in futures if f.exception()]
+        results = finalize_sharded_run(run.name)
+        if errors:
+            raise errors[0]
+        return results
+
+    # Registered before dispatch: the last shard to finish finishes the calling job
+    defer_job_finish(run.name)
+    for shard in shards:
+        frappe.enqueue(
+            "erfmpnext.erfmpnext.api.run_scoring_shard",
+            queue="long",
+            timeout=RFM_SCORING_JOB_TIMEOUT,
+            job_id=f"rfm-scoring-shard::{shard}",
+            deduplicate=True,
+            shard_run=shard,
+            chunk_size=chunk_size,
+        )
+    return {"run": run.name, "shards": shards, "queued": True}
+
+
+@instrumented_job("run_scoring_shard")
+def run_scoring_shard(shard_run, chunk_size=SCORE_CHUNK_SIZE):
+    """Background job: score one customer shard, then merge counters into its coordinator run"""
+    run = frappe.get_doc("RFM Scoring Run", shard_run)
+    try:
+        execute_scoring_run(run, chunk_size)
+    finally:
+        finalize_sharded_run(run.parent_run)
+
+
+def run_scoring_shard_in_process(site, sites_path, shard_run, chunk_size=SCORE_CHUNK_SIZE):
+    """Process pool entry point for run_scoring_shard"""
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    try:
+        run_scoring_shard(shard_run, chunk_size)
+    finally:
+        frappe.destroy()
+
+
+def finalize_sharded_run(run_name):
+    """Merge shard counters into the coordinator run and close it once every shard is done"""
+    # Serialize finalization between shards finishing at the same time
+    status = frappe.db.sql("SELECT status FROM `tabRFM Scoring Run` WHERE name = %s FOR UPDATE", run_name)[0][0]
+    if status in ("Completed", "Failed"):
+        # Another shard already closed the run
+        frappe.db.commit()
+        return {"run": run_name, "status": status}
+
+    shards = frappe.get_all(
+        "RFM Scoring Run",
+        filters={"parent_run": run_name},
+        fields=["status", "processed", "alerts_created", "quantile_sketches"],
+    )
+    values = {
+        "processed": sum(s.processed or 0 for s in shards),
+        "alerts_created": sum(s.alerts_created or 0 for s in shards),
+    }
+    statuses = {s.status for s in shards}
+    if statuses == {"Completed"}:
+        values.update({"status": "Completed", "finished_on": now_datetime()})
+    elif "Failed" in statuses and not statuses & {"Queued", "Running"}:
+        values["status"] = "Failed"
+
+    frappe.db.set_value("RFM Scoring Run", run_name, values, update_modified=False)
+    frappe.db.commit()
+
+    if values.get("status") == "Completed":
+        if is_auto_quantile(frappe.db.get_value("RFM Scoring Run", run_name, "threshold_mode", as_dict=True)):
+            apply_quantile_thresholds(merge_threshold_sketches(s.quantile_sketches for s in shards))
+        invalidate_feature_vectors()
+        enqueue_alert_digest(frappe.db.get_value("RFM Scoring Run", run_name, "started_on"))
+    if values.get("status") in ("Completed", "Failed"):
+        on_scoring_run_finished(run_name, values["status"] == "Completed")
+    return {"run": run_name, **values}
+
+
+def get_resumable_scoring_run():
+    """
+    Latest (coordinator) RFM Scoring Run, if it was interrupted before completing
+    within the last SCORING_RESUME_WINDOW_HOURS; older runs scored stale data.
+    """
+    last_run = frappe.db.get_value(
+        "RFM Scoring Run",
+        {"parent_run": ["is", "not set"]},
+        ["name", "status", "creation"],
+        order_by="creation desc",
+        as_dict=True,
+    )
+    if not last_run or last_run.status == "Completed":
+        return None
+    if last_run.creation < add_to_date(now_datetime(), hours=-SCORING_RESUME_WINDOW_HOURS):
+        return None
+    return frappe.get_doc("RFM Scoring Run", last_run.name)
+
+
+def write_rfm_scores(rows, today):
+    """
+    Upsert a chunk of computed Customer RFM Score rows in bulk (no commit).
+    Returns [(customer, old_average, new_average)] for every customer whose
+    average moved by 0.5 or more, with previous_average/score_changed_on set.
+    """
+    old_averages = dict(frappe.db.sql("""
+        SELECT name, average_score
+        FROM `tabCustomer RFM Score`
+        WHERE name IN %(names)s
+    """, {"names": [row["name"] for row in rows]}))
+
+    changes = []
+    for row in rows:
+        old_average = old_averages.get(row["name"]) or 0
+        row["previous_average"] = None
+        row["score_changed_on"] = None
+
+        # Check for significant score change
+        if old_average and abs(old_average - row["average_score"]) >= 0.5: # More sensitive for small scale
+            row["previous_average"] = old_average
+            row["score_changed_on"] = today
+            changes.append((row["customer"], old_average, row["average_score"]))
+
+    bulk_upsert(
+        "Customer RFM Score",
+        rows,
+        RFM_SCORE_FIELDS,
+        preserve_on_null=("previous_average", "score_changed_on"),
+    )
+    return changes
 
 
 def calculate_payment_score_per_invoice(customer, payment_thresholds):
@@ -179,178 +861,348 @@ def calculate_payment_score_per_invoice(customer, payment_thresholds):
        - If Unpaid/Partial: (Today - Due Date)
     4. Score the "Days Late" using thresholds.
     5. Final P Score = Average of all invoice scores.
+
+    Single-customer variant of `calculate_payment_scores`, kept for ad-hoc use.
     """
-    payment_terms_days = get_payment_terms_days(customer)
-    today = getdate(nowdate())
-    
-    # Get all submitted invoices (not returns)
-    invoices = frappe.db.sql("""
-        SELECT 
-            si.name,
-            si.posting_date,
-            si.due_date,
-            si.grand_total,
-            si.outstanding_amount
-        FROM `tabSales Invoice` si
-        WHERE si.customer = %s 
-            AND si.docstatus = 1 
-            AND si.is_return = 0
-    """, (customer,), as_dict=True)
-    
-    if not invoices:
-        return {
-            'p_score': 5, # Default to 5 if no history? Or 1? Usually 5 (innocent until proven guilty)
-            'payment_terms_days': payment_terms_days,
-            'avg_days_to_pay': 0,
-            'avg_days_late': 0,
-            'on_time_payments': 0,
-            'late_payments': 0
-        }
-    
-    total_invoice_scores = 0
-    valid_invoice_count = 0
-    
-    total_days_late_sum = 0 # For display stats only
-    days_late_count = 0
-    
-    on_time = 0
-    late = 0
-    
+    return calculate_payment_scores([customer], payment_thresholds)[customer]
+
+
+def calculate_payment_scores(customers, payment_thresholds):
+    """
+    Set-based variant of `calculate_payment_score_per_invoice` for a batch of customers.
+    Loads payment terms, invoices and last payment dates in three grouped queries
+    and scores every invoice in memory. Returns {customer: payment_data}.
+    """
+    if not customers:
+        return {}
+
+    return score_payment_features(customers, get_payment_features(customers), payment_thresholds)
+
+
+def get_payment_features(customers):
+    """
+    Date-independent payment features of a batch of customers: payment terms days,
+    a {days_late: invoice count} histogram of settled invoices and a
+    {due_date: invoice count} histogram of open invoices.
+    """
+    terms_map = get_payment_terms_days_map(customers)
+
+    invoices = frappe.db.sql(PAYMENT_INVOICES_QUERY, {"customers": customers}, as_dict=True)
+    last_payment_dates = dict(frappe.db.sql(LAST_PAYMENT_DATES_QUERY, {"customers": customers}))
+
+    invoices_by_customer = {}
     for inv in invoices:
-        posting_date = getdate(inv.posting_date)
-        
-        # Determine Due Date (Use Invoice Due Date if set, else calculate)
-        if inv.due_date:
-            due_date = getdate(inv.due_date)
-        else:
-            due_date = add_days(posting_date, payment_terms_days)
-            
-        # Maturity Check: Has the payment term passed relative to TODAY?
-        # If Today is before Due Date, we can't judge them yet (unless they already paid early!)
-        # Exception: If they paid early, we should count it as a "Good" score (5).
-        
-        is_fully_paid = (inv.outstanding_amount <= 0.1) # Float tolerance
-        
-        effective_payment_date = None
-        
-        if is_fully_paid:
-            # Get the date it was fully paid (max payment date)
-            # We query the Payment Entry Reference to find the latest payment date for this invoice
-            last_payment = frappe.db.sql("""
-                SELECT MAX(pe.posting_date) as paid_date
-                FROM `tabPayment Entry Reference` per
-                JOIN `tabPayment Entry` pe ON per.parent = pe.name
-                WHERE per.reference_name = %s AND pe.docstatus = 1
-            """, (inv.name,))
-            
-            if last_payment and last_payment[0][0]:
-                effective_payment_date = getdate(last_payment[0][0])
-            else:
-                # Fallback: If paid via Journal Entry or Credit Note, use posting date or today?
-                # Let's assume on time if we can't find payment entry (safe default) or posting date
-                effective_payment_date = posting_date 
-                
-        # --- Logic for Days Late ---
-        if is_fully_paid:
-            days_late = (effective_payment_date - due_date).days
-        else:
-            # Unpaid / Partially Paid
-            # If Today < Due Date: It's NOT late yet. It's "Pending".
-            # We should SKIP pending invoices unless we want to reward them for... existing?
-            # User requirement: "if the customer have 90 days... and created 30 days ago we dont calculate it"
-            if today < due_date:
-                continue # Skip unmature invoice
-            
-            # If Today >= Due Date: It is Overdue.
-            days_late = (today - due_date).days
-        
-        # Get Score for this specific invoice
-        # Lower days late = Higher Score
-        inv_score = get_score_from_thresholds(days_late, payment_thresholds, reverse=False)
-        
-        total_invoice_scores += inv_score
-        valid_invoice_count += 1
-        
-        # Stats
-        total_days_late_sum += days_late
-        days_late_count += 1
-        
-        if days_late <= 0:
-            on_time += 1
+        invoices_by_customer.setdefault(inv.customer, []).append(inv)
+
+    features = {}
+    for customer in customers:
+        payment_terms_days = terms_map.get(customer, 0)
+        settled_days_late, open_due_dates = get_invoice_payment_features(
+            invoices_by_customer.get(customer, []), payment_terms_days, last_payment_dates
+        )
+        features[customer] = {
+            "payment_terms_days": payment_terms_days,
+            "settled_days_late": settled_days_late,
+            "open_due_dates": open_due_dates,
+        }
+    return features
+
+
+def score_payment_features(customers, features, payment_thresholds, today=None):
+    """Score the payment features of `customers` as of `today`; returns {customer: payment_data}"""
+    today = getdate(today or nowdate())
+
+    # Flatten the scored invoices of the batch into columns for the scoring kernel
+    customer_index = []
+    days_late = []
+    for i, customer in enumerate(customers):
+        for invoice_days_late in get_invoice_days_late(features[customer], today):
+            customer_index.append(i)
+            days_late.append(invoice_days_late)
+
+    counts, score_sums, days_late_sums, late_counts = summarize_days_late(
+        customer_index, days_late, len(customers), payment_thresholds
+    )
+
+    results = {}
+    for i, customer in enumerate(customers):
+        valid_invoice_count = int(counts[i])
+
+        # Calculate Final Average P Score
+        if valid_invoice_count > 0:
+            final_p_score = round(float(score_sums[i]) / valid_invoice_count, 1)
+            avg_days_late_display = round(float(days_late_sums[i]) / valid_invoice_count, 1)
         else:
-            late += 1
-            
-    # Calculate Final Average P Score
-    if valid_invoice_count > 0:
-        final_p_score = round(total_invoice_scores / valid_invoice_count, 1) # Keep decimal for accuracy? Or integer? R,F,M are integers.
-        # R,F,M are integers 1-5. The api.py `get_score_from_thresholds` returns int.
-        # But `average_score` is float.
-        # Ideally P score should be int to match R,F,M? Or float?
-        # Let's return float, and maybe round it to nearest int if needed, but float is more precise for "Average of invoices".
-        # Actually, `total_score = r + f + m + p`. If p is float, total is float. That's fine.
-        avg_days_late_display = round(total_days_late_sum / days_late_count, 1) if days_late_count else 0
-    else:
-        final_p_score = 5 # Default if no mature invoices found?
-        avg_days_late_display = 0
+            final_p_score = 5 # Default to 5 if no mature invoices (innocent until proven guilty)
+            avg_days_late_display = 0
 
-    return {
-        'p_score': final_p_score,
-        'payment_terms_days': payment_terms_days,
-        'avg_days_to_pay': 0, # Deprecated/Not calculated in this new logic easily
-        'avg_days_late': avg_days_late_display,
-        'on_time_payments': on_time,
-        'late_payments': late
-    }
+        results[customer] = {
+            'p_score': final_p_score,
+            'payment_terms_days': features[customer]["payment_terms_days"],
+            'avg_days_to_pay': 0, # Deprecated/Not calculated in this new logic easily
+            'avg_days_late': avg_days_late_display,
+            'on_time_payments': valid_invoice_count - int(late_counts[i]),
+            'late_payments': int(late_counts[i])
+        }
 
+    return results
 
-def create_alert(customer, alert_type, old_score, new_score):
-    """Create an RFM Alert record"""
-    alert = frappe.new_doc("RFM Alert")
-    alert.customer = customer
-    alert.alert_type = alert_type
-    alert.previous_segment = old_score
-    alert.new_segment = new_score
-    alert.created_on = now_datetime()
-    alert.insert(ignore_permissions=True)
 
+def get_payment_terms_days_map(customers):
+    """Get credit days from the default payment terms template of many customers at once"""
+    if not customers:
+        return {}
 
-@frappe.whitelist()
+    rows = frappe.db.sql("""
+        SELECT c.name as customer, ptd.credit_days
+        FROM `tabCustomer` c
+        LEFT JOIN `tabPayment Terms Template Detail` ptd ON ptd.parent = c.payment_terms
+            AND ptd.idx = (
+                SELECT MIN(d.idx) FROM `tabPayment Terms Template Detail` d
+                WHERE d.parent = c.payment_terms
+            )
+        WHERE c.name IN %(customers)s
+    """, {"customers": customers}, as_dict=True)
+
+    return {row.customer: row.credit_days or 0 for row in rows}
+
+
+def write_alerts(events, customer_names):
+    """
+    Bulk insert RFM Alerts for (customer, alert_type, old_score, new_score) events,
+    skipping customers that already got an alert of the same type today.
+    Returns the number of alerts inserted. Does not commit.
+    """
+    if not events:
+        return 0
+
+    now = now_datetime()
+    # Anti-join against today's alerts so re-runs on the same day add nothing
+    alerted_today = set(frappe.db.sql("""
+        SELECT customer, alert_type
+        FROM `tabRFM Alert`
+        WHERE customer IN %(customers)s AND created_on >= %(today)s
+    """, {"customers": [event[0] for event in events], "today": getdate(now)}))
+    events = [event for event in events if (event[0], event[1]) not in alerted_today]
+    if not events:
+        return 0
+
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "RFM Alert",
+        fields=[
+            "name", "customer", "customer_name", "alert_type", "previous_segment", "new_segment",
+            "is_read", "created_on", "creation", "modified", "owner", "modified_by",
+        ],
+        values=[
+            (name, customer, customer_names.get(customer), alert_type, f"{old_score}", f"{new_score}",
+             0, now, now, now, user, user)
+            for name, (customer, alert_type, old_score, new_score)
+            in zip(reserve_names("RFM-ALERT-", len(events)), events, strict=True)
+        ],
+    )
+    return len(events)
+
+
+def enqueue_alert_digest(since):
+    """Queue one digest email of the RFM Alerts created since `since` for the configured recipient"""
+    recipient = frappe.db.get_single_value("RFM Settings", "alert_recipients")
+    if not recipient or not frappe.db.exists("RFM Alert", {"created_on": [">=", since]}):
+        return
+
+    frappe.enqueue(
+        "erfmpnext.erfmpnext.api.send_alert_digest",
+        queue="short",
+        job_id=f"rfm-alert-digest::{since}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        since=since,
+        recipient=recipient,
+    )
+
+
+def send_alert_digest(since, recipient):
+    """Background job: email a summary of the RFM Alerts created since `since`"""
+    counts = dict(frappe.db.sql("""
+        SELECT alert_type, COUNT(*)
+        FROM `tabRFM Alert`
+        WHERE created_on >= %(since)s
+        GROUP BY alert_type
+    """, {"since": since}))
+    if not counts:
+        return
+
+    alerts = frappe.get_all("RFM Alert",
+        filters={"created_on": [">=", since]},
+        fields=["name", "customer", "customer_name", "alert_type", "previous_segment", "new_segment"],
+        order_by="created_on desc, name desc",
+        limit=ALERT_DIGEST_ROWS,
+    )
+    total = sum(counts.values())
+    frappe.sendmail(
+        recipients=[recipient],
+        subject=_("RFM score changes: {0} alerts").format(total),
+        template="rfm_alert_digest",
+        args={
+            "counts": counts,
+            "total": total,
+            "alerts": alerts,
+            "more": total - len(alerts),
+            "alerts_url": frappe.utils.get_url_to_list("RFM Alert"),
+        },
+    )
+
+
+@instrumented_job("create_history_snapshot")
 def create_history_snapshot():
-    """Create a daily snapshot of all RFM scores for trend analysis"""
+    """Create a daily snapshot of all RFM scores for trend analysis (safe to re-run)"""
     today = nowdate()
-    
-    scores = frappe.get_all("Customer RFM Score", 
-        fields=["customer", "recency_score", "frequency_score", "monetary_score", "payment_score", "average_score"]
-    )
-    
-    for score in scores:
-        # Check if snapshot already exists for today
-        exists = frappe.db.exists("RFM History", {
-            "customer": score.customer,
-            "snapshot_date": today
-        })
-        
-        if not exists:
-            history = frappe.new_doc("RFM History")
-            history.customer = score.customer
-            history.snapshot_date = today
-            history.recency_score = score.recency_score
-            history.frequency_score = score.frequency_score
-            history.monetary_score = score.monetary_score
-            history.segment = str(score.average_score)  # Store average as segment
-            history.rfm_score = f"R{score.recency_score}-F{score.frequency_score}-M{score.monetary_score}-P{score.payment_score or 0}"
-            history.insert(ignore_permissions=True)
-    
-    frappe.db.commit()
-    return {"snapshots_created": len(scores)}
+
+    # Anti-join: only customers without a snapshot for today
+    with stage("snapshot_query") as metrics:
+        scores = frappe.db.sql(HISTORY_SNAPSHOT_QUERY, {"today": today}, as_dict=True)
+        metrics["rows"] = len(scores)
+
+    now = now_datetime()
+    user = frappe.session.user
+    with stage("snapshot_insert") as metrics:
+        for start in range(0, len(scores), SNAPSHOT_CHUNK_SIZE):
+            frappe.db.bulk_insert(
+                "RFM History",
+                fields=[
+                    "name", "customer", "snapshot_date", "recency_score", "frequency_score", "monetary_score",
+                    "payment_score", "average_score", "segment", "rfm_score", "creation", "modified", "owner", "modified_by",
+                ],
+                values=[
+                    (
+                        f"RFM-HIST-{score.customer}-{today}",
+                        score.customer,
+                        today,
+                        score.recency_score,
+                        score.frequency_score,
+                        score.monetary_score,
+                        score.payment_score,
+                        score.average_score,
+                        str(score.average_score),  # Store average as segment
+                        f"R{score.recency_score}-F{score.frequency_score}-M{score.monetary_score}-P{score.payment_score or 0}",
+                        now, now, user, user,
+                    )
+                    for score in scores[start:start + SNAPSHOT_CHUNK_SIZE]
+                ],
+                ignore_duplicates=True,
+            )
+            frappe.db.commit()
+        metrics["rows"] = len(scores)
+
+    with stage("segment_rollup"):
+        update_segment_rollup(today)
+        frappe.db.commit()
+
+    total = frappe.db.count("Customer RFM Score")
+    return {"snapshots_created": len(scores), "already_present": total - len(scores)}
+
+
+def update_segment_rollup(snapshot_date):
+    """
+    (Re)build the RFM Segment Rollup rows of one snapshot date from its RFM History:
+    customer count and average R/F/M/P/score per average-score bucket.
+    """
+    rollups = frappe.db.sql("""
+        SELECT
+            bucket as score_bucket,
+            COUNT(*) as customer_count,
+            AVG(average_score) as avg_score,
+            AVG(recency_score) as avg_recency,
+            AVG(frequency_score) as avg_frequency,
+            AVG(monetary_score) as avg_monetary,
+            AVG(payment_score) as avg_payment
+        FROM (
+            SELECT
+                h.*,
+                CASE
+                    WHEN average_score >= 5 THEN 5
+                    WHEN average_score >= 4 THEN 4
+                    WHEN average_score >= 3 THEN 3
+                    WHEN average_score >= 2 THEN 2
+                    ELSE 1
+                END as bucket
+            FROM (
+                -- Snapshots taken before average_score was stored keep it in segment
+                SELECT
+                    COALESCE(average_score, CAST(segment AS DECIMAL(4, 1))) as average_score,
+                    recency_score, frequency_score, monetary_score, payment_score
+                FROM `tabRFM History`
+                WHERE snapshot_date = %(snapshot_date)s
+            ) h
+            WHERE h.average_score IS NOT NULL
+        ) scored
+        GROUP BY bucket
+    """, {"snapshot_date": snapshot_date}, as_dict=True)
+
+    frappe.db.delete("RFM Segment Rollup", {"snapshot_date": snapshot_date})
+    for rollup in rollups:
+        rollup.name = f"RFM-ROLLUP-{snapshot_date}-{rollup.score_bucket}"
+        rollup.snapshot_date = snapshot_date
+        rollup.segment = SEGMENT_LABELS[rollup.score_bucket]
+
+    bulk_upsert("RFM Segment Rollup", rollups, (
+        "snapshot_date", "segment", "score_bucket", "customer_count", "avg_score",
+        "avg_recency", "avg_frequency", "avg_monetary", "avg_payment",
+    ))
+
+
+@frappe.whitelist()
+def get_dashboard_summary():
+    """
+    Everything the RFM dashboard needs in one round trip: segment distribution,
+    KPIs, unread alert count and recent alerts. Served from the Redis cache until
+    a scoring run or an alert change bumps the dashboard cache version.
+    """
+    return get_cached(DASHBOARD_CACHE, "summary", build_dashboard_summary)
+
+
+def build_dashboard_summary():
+    """Uncached body of get_dashboard_summary"""
+    kpis = frappe.db.sql("""
+        SELECT
+            COUNT(*) as customers,
+            ROUND(AVG(average_score), 1) as avg_score,
+            SUM(total_spent) as total_spent,
+            SUM(CASE WHEN average_score < 2 THEN 1 ELSE 0 END) as at_risk,
+            MAX(last_calculated) as last_calculated
+        FROM `tabCustomer RFM Score`
+    """, as_dict=True)[0]
+
+    return {
+        "distribution": build_segment_distribution(),
+        "kpis": kpis,
+        "unread_alerts": frappe.db.count("RFM Alert", {"is_read": 0}),
+        "recent_alerts": get_alerts(limit=10, unread_only=False),
+    }
+
+
+def invalidate_feature_vectors():
+    """Drop the threshold simulator's feature vectors after a full scoring run and rebuild them in the background"""
+    bump_cache_version(FEATURES_CACHE)
+    enqueue_job("simulation_vectors")
+
+
+def invalidate_dashboard_cache():
+    """Drop the cached dashboard summary (after scoring runs and alert changes)"""
+    bump_cache_version(DASHBOARD_CACHE)
 
 
 @frappe.whitelist()
 def get_segment_distribution():
     """Get count of customers by average score ranges (1-5 Scale)"""
+    return get_dashboard_summary()["distribution"]
+
+
+def build_segment_distribution():
+    """Uncached segment distribution query"""
     data = frappe.db.sql("""
-        SELECT 
-            CASE 
+        SELECT
+            CASE
                 WHEN average_score >= 5 THEN 'Excellent (5)'
                 WHEN average_score >= 4 THEN 'Good (4)'
                 WHEN average_score >= 3 THEN 'Average (3)'
@@ -361,8 +1213,8 @@ def get_segment_distribution():
             ROUND(AVG(average_score), 1) as avg_score
         FROM `tabCustomer RFM Score`
         WHERE average_score IS NOT NULL
-        GROUP BY 
-            CASE 
+        GROUP BY
+            CASE
                 WHEN average_score >= 5 THEN 'Excellent (5)'
                 WHEN average_score >= 4 THEN 'Good (4)'
                 WHEN average_score >= 3 THEN 'Average (3)'
@@ -371,26 +1223,38 @@ def get_segment_distribution():
             END
         ORDER BY avg_score DESC
     """, as_dict=True)
-    
+
     return data
 
 
 @frappe.whitelist()
 def get_trend_data(customer=None, days=30):
-    """Get historical segment data for trend charts"""
+    """
+    Get historical segment data for trend charts.
+    Portfolio-wide trends come from the daily RFM Segment Rollup (a handful of rows
+    per day); raw RFM History rows are only returned for a single customer.
+    """
     from_date = add_days(nowdate(), -int(days))
-    
-    filters = {"snapshot_date": [">=", from_date]}
-    if customer:
-        filters["customer"] = customer
-    
-    data = frappe.get_all("RFM History",
-        filters=filters,
-        fields=["customer", "snapshot_date", "segment", "recency_score", "frequency_score", "monetary_score"],
-        order_by="snapshot_date asc"
+
+    if not customer:
+        return frappe.get_all("RFM Segment Rollup",
+            filters={"snapshot_date": [">=", from_date]},
+            fields=["snapshot_date", "segment", "score_bucket", "customer_count", "avg_score",
+                "avg_recency", "avg_frequency", "avg_monetary", "avg_payment"],
+            order_by="snapshot_date asc, score_bucket desc"
+        )
+
+    return get_customer_history(customer, from_date)
+
+
+def get_customer_history(customer, from_date, run=True):
+    """RFM History rows of one customer since `from_date` (the SQL itself when not `run`)"""
+    return frappe.get_all("RFM History",
+        filters={"snapshot_date": [">=", from_date], "customer": customer},
+        fields=["customer", "snapshot_date", "segment", "recency_score", "frequency_score", "monetary_score", "payment_score"],
+        order_by="snapshot_date asc",
+        run=run,
     )
-    
-    return data
 
 
 @frappe.whitelist()
@@ -399,181 +1263,253 @@ def get_alerts(limit=20, unread_only=True):
     filters = {}
     if unread_only:
         filters["is_read"] = 0
-    
+
     alerts = frappe.get_all("RFM Alert",
         filters=filters,
         fields=["name", "customer", "customer_name", "alert_type", "previous_segment", "new_segment", "created_on", "is_read"],
         order_by="created_on desc",
         limit=int(limit)
     )
-    
+
     return alerts
 
 
 @frappe.whitelist()
 def mark_alert_read(alert_name):
     """Mark an alert as read"""
+    frappe.has_permission("RFM Alert", "write", alert_name, throw=True)
+    frappe.db.set_value("RFM Alert", alert_name, "is_read", 1)
+    invalidate_dashboard_cache()
     return {"success": True}
 
 
-@frappe.whitelist()
+@instrumented_job("calculate_product_analytics")
 def calculate_product_analytics():
     """Calculate ABC, XYZ, Turnover, and GMROI for all items"""
     today = getdate(nowdate())
-    period_start = add_months(today, -12) # Last 12 months
-    
-    # 1. Fetch Sales Data (Revenue, Qty, Count)
-    sales_data = frappe.db.sql("""
-        SELECT 
-            sii.item_code,
-            SUM(sii.base_net_amount) as revenue,
-            SUM(sii.qty) as sales_qty,
-            COUNT(DISTINCT sii.parent) as invoice_count
-        FROM `tabSales Invoice Item` sii
-        JOIN `tabSales Invoice` si ON sii.parent = si.name
-        WHERE si.docstatus = 1 AND si.posting_date >= %s
-        GROUP BY sii.item_code
-    """, (period_start,), as_dict=True)
-    
+    month_slots = get_month_slots(today) # Last 12 months
+
+    # 1. Fetch Sales Data (Revenue, Qty, Count) from the item x month sales cube
+    publish_progress(_("Reading sales"))
+    with stage("sales_cube") as metrics:
+        monthly_sales = frappe.db.sql(PRODUCT_SALES_QUERY, {"window_start": month_slots[0]}, as_dict=True)
+        sales_data = summarize_monthly_sales(monthly_sales)
+        metrics["rows"] = len(monthly_sales)
+
     if not sales_data:
         return {"processed": 0, "message": "No sales data found in the last 12 months."}
 
     # 2. Inventory Data (Turnover & Valuation)
-    stock_data = frappe.get_all("Bin", fields=["item_code", "actual_qty", "valuation_rate"])
-    stock_map = {d.item_code: d for d in stock_data}
+    with stage("stock_query") as metrics:
+        stock_data = frappe.get_all("Bin", fields=["item_code", "actual_qty", "valuation_rate"])
+        stock_map = {d.item_code: d for d in stock_data}
+        metrics["rows"] = len(stock_data)
 
     # 3. ABC Analysis (Revenue Based)
     sales_data.sort(key=lambda x: x.revenue, reverse=True)
     total_revenue = sum(item.revenue for item in sales_data)
     running_revenue = 0
-    
-    # 4. XYZ Analysis (Variability Based)
-    monthly_sales = frappe.db.sql("""
-        SELECT 
-            sii.item_code,
-            DATE_FORMAT(si.posting_date, '%%Y-%%m') as month,
-            SUM(sii.qty) as qty
-        FROM `tabSales Invoice Item` sii
-        JOIN `tabSales Invoice` si ON sii.parent = si.name
-        WHERE si.docstatus = 1 AND si.posting_date >= %s
-        GROUP BY sii.item_code, month
-    """, (period_start,), as_dict=True)
+
+    # 4. XYZ Analysis (Variability Based) over an item x month matrix
+    with stage("xyz_analysis") as metrics:
+        demand = build_month_matrix([item.item_code for item in sales_data], month_slots, monthly_sales)
+        cvs, xyz_classes = classify_xyz(demand)
+        metrics["rows"] = len(sales_data)
 
     # Process results
-    processed = 0
-    for item in sales_data:
-        # ABC Logic
-        running_revenue += item.revenue
-        ratio = (running_revenue / total_revenue) * 100 if total_revenue else 100
-        abc = 'A' if ratio <= 80 else ('B' if ratio <= 95 else 'C')
-        
-        # XYZ Logic
-        item_months = [m.qty for m in monthly_sales if m.item_code == item.item_code]
-        while len(item_months) < 12:
-            item_months.append(0)
-            
-        cv = 0
-        xyz = 'Z'
-        if len(item_months) > 1:
-            mean = sum(item_months) / 12
-            if mean > 0:
-                std = statistics.pstdev(item_months)
-                cv = (std / mean)
-                xyz = 'X' if cv < 0.5 else ('Y' if cv <= 1.0 else 'Z')
-
-        # Turnover & GMROI Logic
-        bin_data = stock_map.get(item.item_code)
-        stock_qty = bin_data.actual_qty if bin_data and bin_data.actual_qty > 0 else 0
-        valuation = bin_data.valuation_rate if bin_data and bin_data.valuation_rate > 0 else 0
-        avg_inv_value = (valuation * stock_qty)
-        
-        # Calculate approx COGS and Profit using current valuation
-        item_cogs = valuation * item.sales_qty
-        item_profit = item.revenue - item_cogs
-        
-        turnover = item_cogs / avg_inv_value if avg_inv_value > 0 else 0
-        gmroi = (item_profit / avg_inv_value) if avg_inv_value > 0 else 0
-
-        # Save to Item Analytics
-        existing = frappe.db.exists("Item Analytics", item.item_code)
-        if existing:
-            doc = frappe.get_doc("Item Analytics", item.item_code)
-        else:
-            doc = frappe.new_doc("Item Analytics")
-            doc.item_code = item.item_code
-            
-        doc.revenue = item.revenue
-        doc.profit = item_profit
-        doc.sales_count = item.sales_qty
-        doc.abc_category = abc
-        doc.xyz_category = xyz
-        doc.cv = cv
-        doc.turnover_ratio = turnover
-        doc.gmroi = gmroi
-        doc.last_calculated = now_datetime()
-        doc.save(ignore_permissions=True)
-        processed += 1
-        
+    with stage("save_item_analytics") as metrics:
+        processed = 0
+        for i, item in enumerate(sales_data):
+            # ABC Logic
+            running_revenue += item.revenue
+            ratio = (running_revenue / total_revenue) * 100 if total_revenue else 100
+            abc = 'A' if ratio <= 80 else ('B' if ratio <= 95 else 'C')
+
+            # XYZ Logic
+            cv = float(cvs[i])
+            xyz = str(xyz_classes[i])
+
+            # Turnover & GMROI Logic
+            bin_data = stock_map.get(item.item_code)
+            stock_qty = bin_data.actual_qty if bin_data and bin_data.actual_qty > 0 else 0
+            valuation = bin_data.valuation_rate if bin_data and bin_data.valuation_rate > 0 else 0
+            avg_inv_value = (valuation * stock_qty)
+
+            # Calculate approx COGS and Profit using current valuation
+            item_cogs = valuation * item.sales_qty
+            item_profit = item.revenue - item_cogs
+
+            turnover = item_cogs / avg_inv_value if avg_inv_value > 0 else 0
+            gmroi = (item_profit / avg_inv_value) if avg_inv_value > 0 else 0
+
+            # Save to Item Analytics
+            existing = frappe.db.exists("Item Analytics", item.item_code)
+            if existing:
+                doc = frappe.get_doc("Item Analytics", item.item_code)
+            else:
+                doc = frappe.new_doc("Item Analytics")
+                doc.item_code = item.item_code
+
+            doc.revenue = item.revenue
+            doc.profit = item_profit
+            doc.sales_count = item.sales_qty
+            doc.abc_category = abc
+            doc.xyz_category = xyz
+            doc.cv = cv
+            doc.turnover_ratio = turnover
+            doc.gmroi = gmroi
+            doc.last_calculated = now_datetime()
+            doc.save(ignore_permissions=True)
+            processed += 1
+            if processed % PROGRESS_INTERVAL == 0:
+                publish_progress(_("Saving item analytics"), processed, len(sales_data))
+        metrics["rows"] = processed
+
+    publish_progress(_("Market basket analysis"))
     calculate_market_basket()
     frappe.db.commit()
+    bump_cache_version(PRODUCT_CACHE)
     return {"processed": processed}
 
 
+@frappe.whitelist()
+def get_product_matrix():
+    """
+    ABC/XYZ matrix of the product analytics page: item count, revenue, profit and
+    turnover per cell, plus the same KPIs over all items. Served from the Redis
+    cache until the next calculate_product_analytics run.
+    """
+    frappe.has_permission("Item Analytics", "read", throw=True)
+    return get_cached(PRODUCT_CACHE, "matrix", build_product_matrix)
+
+
+def build_product_matrix():
+    """Uncached body of get_product_matrix"""
+    rows = frappe.db.sql("""
+        SELECT
+            abc_category, xyz_category,
+            COUNT(*) as items,
+            SUM(revenue) as revenue,
+            SUM(profit) as profit,
+            SUM(turnover_ratio) as turnover_ratio
+        FROM `tabItem Analytics`
+        GROUP BY abc_category, xyz_category
+    """, as_dict=True)
+
+    cells = {
+        abc + xyz: {"items": 0, "revenue": 0, "profit": 0, "turnover_ratio": 0}
+        for abc in ABC_CATEGORIES for xyz in XYZ_CATEGORIES
+    }
+    totals = {"items": 0, "revenue": 0, "profit": 0, "turnover_ratio": 0}
+    for row in rows:
+        key = f"{row.abc_category or ''}{row.xyz_category or ''}"
+        for target in (cells.get(key), totals):
+            if target is None:
+                continue
+            target["items"] += row.items
+            target["revenue"] += flt(row.revenue)
+            target["profit"] += flt(row.profit)
+            target["turnover_ratio"] += flt(row.turnover_ratio)
+
+    # Ratios do not add up: cells report the average turnover of their items
+    for values in (*cells.values(), totals):
+        values["avg_turnover_ratio"] = flt(values.pop("turnover_ratio") / values["items"], 2) if values["items"] else 0
+
+    return {"cells": cells, "totals": totals}
+
+
+@instrumented_job("calculate_market_basket")
 def calculate_market_basket():
     """Find items frequently bought together (Association Rules)"""
-    frappe.db.delete("Item Basket Analysis", {"last_calculated": ["!=", None]})
-    
-    invoices = frappe.db.sql("""
-        SELECT parent, item_code 
-        FROM `tabSales Invoice Item` 
-        WHERE docstatus = 1
-        ORDER BY parent
-    """, as_dict=True)
-    
-    if not invoices: return
-
-    invoice_map = {}
-    for row in invoices:
-        if row.parent not in invoice_map:
-            invoice_map[row.parent] = set()
-        invoice_map[row.parent].add(row.item_code)
-        
-    total_invoices = len(invoice_map)
-    item_counts = {}
-    pair_counts = {}
-    
-    for items in invoice_map.values():
-        items_list = list(items)
-        for i, item_a in enumerate(items_list):
-            item_counts[item_a] = item_counts.get(item_a, 0) + 1
-            for item_b in items_list[i+1:]:
-                pair = tuple(sorted((item_a, item_b)))
-                pair_counts[pair] = pair_counts.get(pair, 0) + 1
-                
-    min_support_count = max(2, total_invoices * 0.01) # Lower threshold for basket
-    
-    for (item_a, item_b), count in pair_counts.items():
-        if count < min_support_count: continue
-        
-        support = (count / total_invoices) * 100
-        
-        # Rule: A -> B
-        conf_a_b = (count / item_counts[item_a]) * 100
-        lift = (support/100) / ((item_counts[item_a]/total_invoices) * (item_counts[item_b]/total_invoices))
-        save_basket_rule(item_a, item_b, support, conf_a_b, lift, count)
-        
-        # Rule: B -> A
-        conf_b_a = (count / item_counts[item_b]) * 100
-        save_basket_rule(item_b, item_a, support, conf_b_a, lift, count)
-
-
-def save_basket_rule(a, b, support, confidence, lift, count):
-    doc = frappe.new_doc("Item Basket Analysis")
-    doc.item_a = a
-    doc.item_b = b
-    doc.support = support
-    doc.confidence = confidence
-    doc.lift = lift
-    doc.frequency = count
-    doc.last_calculated = now_datetime()
-    doc.insert(ignore_permissions=True)
+    settings = frappe.get_single("RFM Settings")
+    with stage("basket_mining") as metrics:
+        result = mine_frequent_itemsets(
+            max_itemset_size=cint(settings.basket_max_itemset_size) or 2,
+            max_counters=cint(settings.basket_max_counters) or DEFAULT_MAX_COUNTERS,
+        )
+        metrics["rows"] = result.total_invoices
+
+    # Stage the new rules under a fresh generation; readers keep seeing the current one
+    generation = max(
+        cint(settings.basket_generation),
+        cint(frappe.db.sql("SELECT MAX(generation) FROM `tabItem Basket Analysis`")[0][0]),
+    ) + 1
+
+    metric = settings.recommendation_metric or "Lift"
+    with stage("recommendation_index") as metrics:
+        rules = list(get_pair_rules(result.total_invoices, result.item_support, result.pairs))
+        # Top-K consequents per item, served by recommendations.get_recommendations
+        ranks = rank_consequents(
+            rules,
+            cint(settings.recommendation_top_k) or DEFAULT_RECOMMENDATION_TOP_K,
+            metric,
+        )
+        metrics["rows"] = sum(1 for rank in ranks if rank)
+
+    with stage("basket_write_rules") as metrics:
+        rule_items = list({item for rule in rules for item in rule[:2]})
+        item_names = dict(frappe.get_all(
+            "Item", filters={"name": ["in", rule_items]}, fields=["name", "item_name"], as_list=True
+        )) if rule_items else {}
+
+        now = now_datetime()
+        user = frappe.session.user
+        for start in range(0, len(rules), BASKET_RULE_CHUNK_SIZE):
+            chunk = rules[start:start + BASKET_RULE_CHUNK_SIZE]
+            frappe.db.bulk_insert(
+                "Item Basket Analysis",
+                fields=[
+                    "name", "item_a", "item_a_name", "item_b", "item_b_name", "support", "confidence", "lift",
+                    "frequency", "recommendation_rank", "generation", "last_calculated",
+                    "creation", "modified", "owner", "modified_by",
+                ],
+                values=[
+                    (name, a, item_names.get(a), b, item_names.get(b), support, confidence, lift,
+                     count, rank, generation, now, now, now, user, user)
+                    for name, (a, b, support, confidence, lift, count), rank in zip(
+                        reserve_names("BASKET-", len(chunk), digits=10),
+                        chunk,
+                        ranks[start:start + BASKET_RULE_CHUNK_SIZE],
+                        strict=True,
+                    )
+                ],
+            )
+            frappe.db.commit()
+        metrics["rows"] = len(rules)
+
+    # Atomic swap: readers switch to the new generation (and the metric it is ranked by) in a single commit
+    frappe.db.set_single_value("RFM Settings", {"basket_generation": generation, "basket_generation_metric": metric})
+    frappe.db.commit()
+
+    # Garbage-collect older generations (and leftovers of interrupted runs)
+    frappe.db.delete("Item Basket Analysis", {"generation": ["!=", generation]})
+    frappe.db.commit()
+
+    result.generation = generation
+    result.rules = len(rules)
+    return result
+
+
+def get_basket_generation(with_metric=False):
+    """
+    Generation of Item Basket Analysis rules currently visible to readers; with
+    `with_metric`, (generation, metric its recommendations were ranked by).
+    """
+    if not with_metric:
+        return cint(frappe.db.get_single_value("RFM Settings", "basket_generation"))
+
+    generation, metric = frappe.db.get_value(
+        "RFM Settings", "RFM Settings", ["basket_generation", "basket_generation_metric"]
+    )
+    return cint(generation), metric or "Lift"
+
+
+@frappe.whitelist()
+def get_basket_rules(limit=10):
+    """Top association rules of the current generation, by confidence"""
+    return frappe.get_all("Item Basket Analysis",
+        filters={"generation": get_basket_generation()},
+        fields=["item_a", "item_a_name", "item_b", "item_b_name", "confidence", "support", "lift", "frequency"],
+        order_by="confidence desc",
+        limit=int(limit)
+    )
@@ -0,0 +1,172 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Pair and itemset counting, association rules and recommendation ranking.
+
+Pure functions behind market_basket (which reads the invoices) and
+recommendations (which serves the ranked rules). Items are counted as integer
+ids 0..n-1 and baskets are sorted tuples of those ids.
+"""
+
+from itertools import combinations
+from math import comb
+
+# Pair/itemset counters held in memory at once
+DEFAULT_MAX_COUNTERS = 2_000_000
+
+
+class CounterBudgetExceeded(Exception):
+    """The counters of one pass do not fit in the counter budget"""
+
+
+def count_pairs(iter_baskets, n, min_support_count, max_counters=DEFAULT_MAX_COUNTERS, on_split=None):
+    """
+    Exact support of every frequent item pair, as {a * n + b: count} with a < b.
+    `iter_baskets()` streams the baskets again for every pass. Never holds more
+    than `max_counters` counters: on overflow the pair space is split into twice
+    as many partitions (by first item), `on_split(partitions)` is called and the
+    pairs are counted again. Raises CounterBudgetExceeded when one partition per
+    item still overflows.
+    """
+    partitions = 1
+    while True:
+        frequent_pairs = {}
+        for partition in range(partitions):
+            counts = count_pair_partition(iter_baskets(), n, partition, partitions, max_counters)
+            if counts is None:
+                break
+            frequent_pairs.update((key, c) for key, c in counts.items() if c >= min_support_count)
+        else:
+            return frequent_pairs
+
+        if partitions >= n:
+            raise CounterBudgetExceeded(max_counters)
+        partitions *= 2
+        if on_split:
+            on_split(partitions)
+
+
+def count_pair_partition(baskets, n, partition, partitions, max_counters):
+    """One streaming pass counting the pairs whose first item falls in `partition`; None on overflow"""
+    counts = {}
+    for basket in baskets:
+        for i, a in enumerate(basket):
+            if a % partitions != partition:
+                continue
+            base = a * n
+            for b in basket[i + 1:]:
+                key = base + b
+                counts[key] = counts.get(key, 0) + 1
+        if len(counts) > max_counters:
+            return None
+    return counts
+
+
+def count_itemsets(iter_baskets, frequent, size, min_support_count, max_counters=DEFAULT_MAX_COUNTERS):
+    """
+    Apriori level: exact support of the frequent `size`-itemsets, as {(id, ...): count},
+    from candidates built out of the frequent (size - 1)-itemsets `frequent`.
+    Raises CounterBudgetExceeded when the candidates do not fit in `max_counters`.
+    """
+    candidates = set()
+    ordered = sorted(frequent)
+    for i, left in enumerate(ordered):
+        for right in ordered[i + 1:]:
+            if left[:-1] != right[:-1]:
+                break
+            candidate = (*left, right[-1])
+            # Every (size - 1)-subset must itself be frequent
+            if all(subset in frequent for subset in combinations(candidate, size - 1)):
+                candidates.add(candidate)
+
+    if not candidates:
+        return {}
+    if len(candidates) > max_counters:
+        raise CounterBudgetExceeded(max_counters)
+
+    candidate_items = {item for candidate in candidates for item in candidate}
+    counts = dict.fromkeys(candidates, 0)
+    for basket in iter_baskets():
+        basket = tuple(item for item in basket if item in candidate_items)
+        if len(basket) < size:
+            continue
+        # Enumerate the cheaper side: basket subsets or candidates
+        if comb(len(basket), size) <= len(candidates):
+            for subset in combinations(basket, size):
+                if subset in counts:
+                    counts[subset] += 1
+        else:
+            basket_set = set(basket)
+            for candidate in candidates:
+                if basket_set.issuperset(candidate):
+                    counts[candidate] += 1
+
+    return {itemset: c for itemset, c in counts.items() if c >= min_support_count}
+
+
+def get_pair_rules(total_invoices, item_support, pairs):
+    """
+    A -> B and B -> A association rules of every frequent pair {(a, b): invoice count}:
+    (a, b, support, confidence, lift, count), support and confidence in percent.
+    """
+    for (item_a, item_b), count in pairs.items():
+        support = (count / total_invoices) * 100
+        lift = (support / 100) / ((item_support[item_a] / total_invoices) * (item_support[item_b] / total_invoices))
+
+        # Rule: A -> B
+        yield item_a, item_b, support, (count / item_support[item_a]) * 100, lift, count
+
+        # Rule: B -> A
+        yield item_b, item_a, support, (count / item_support[item_b]) * 100, lift, count
+
+
+def rank_consequents(rules, top_k, metric="Lift"):
+    """
+    Recommendation rank of every rule among the rules of its antecedent item:
+    1 for the best consequent by `metric` ("Lift" or "Confidence", the other one
+    breaking ties, then the consequent's code), up to `top_k`; 0 for the rest.
+    Returns ranks aligned with `rules`.
+    """
+    primary, secondary = (4, 3) if metric == "Lift" else (3, 4)
+    by_antecedent = {}
+    for i, rule in enumerate(rules):
+        by_antecedent.setdefault(rule[0], []).append(i)
+
+    ranks = [0] * len(rules)
+    for indexes in by_antecedent.values():
+        indexes.sort(key=lambda i: (-rules[i][primary], -rules[i][secondary], rules[i][1]))
+        for rank, i in enumerate(indexes[:top_k], 1):
+            ranks[i] = rank
+    return ranks
+
+
+def merge_recommendations(basket, recommendations_by_item, metric="Lift", limit=10):
+    """
+    Merge the per-item recommendations of a basket: items already in the basket
+    are dropped, and a consequent recommended by several basket items adds up
+    their `metric` ("Lift" or "Confidence") scores.
+    """
+    field = "lift" if metric == "Lift" else "confidence"
+    in_basket = set(basket)
+    merged = {}
+    for item in basket:
+        for recommendation in recommendations_by_item.get(item) or []:
+            item_code = recommendation["item_code"]
+            if item_code in in_basket:
+                continue
+            entry = merged.setdefault(item_code, {
+                "item_code": item_code,
+                "item_name": recommendation["item_name"],
+                "score": 0,
+                "confidence": 0,
+                "lift": 0,
+                "because_of": [],
+            })
+            entry["score"] += recommendation[field]
+            entry["confidence"] = max(entry["confidence"], recommendation["confidence"])
+            entry["lift"] = max(entry["lift"], recommendation["lift"])
+            entry["because_of"].append(item)
+
+    ranked = sorted(merged.values(), key=lambda entry: (-entry["score"], -len(entry["because_of"]), entry["item_code"]))
+    return ranked[:limit]
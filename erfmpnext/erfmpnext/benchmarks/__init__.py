@@ -0,0 +1,7 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Synthetic-data benchmarks for the analytics jobs. Run against a local test site:
+    bench --site test_site execute erfmpnext.erfmpnext.benchmarks.harness.run --kwargs "{'scale': '100k'}"
+"""
@@ -0,0 +1,108 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Benchmark harness: generates a seeded synthetic dataset, runs every analytics
+stage against it and writes wall time, query count, peak RSS growth and rows/sec
+per stage to a JSON file that later runs can be compared with.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+
+import frappe
+from frappe.utils import now_datetime
+
+from erfmpnext.erfmpnext import api
+from erfmpnext.erfmpnext.benchmarks.synthetic import delete_synthetic_data, generate_synthetic_data
+from erfmpnext.erfmpnext.customer_facts import rebuild_customer_facts
+from erfmpnext.erfmpnext.profiling import count_queries
+from erfmpnext.erfmpnext.sales_cube import rebuild_sales_cube
+
+# (stage name, callable, function extracting the processed row count from its result)
+STAGES = (
+    ("rebuild_customer_facts", rebuild_customer_facts, lambda r: r["rows"]),
+    ("rebuild_sales_cube", rebuild_sales_cube, lambda r: r["rows"]),
+    ("calculate_rfm_scores", api.calculate_rfm_scores, lambda r: r["processed"]),
+    ("create_history_snapshot", api.create_history_snapshot, lambda r: r["snapshots_created"]),
+    ("calculate_product_analytics", api.calculate_product_analytics, lambda r: r.get("processed", 0)),
+    ("calculate_market_basket", api.calculate_market_basket, lambda r: r.total_invoices),
+)
+
+
+def get_peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_stage(name, fn, count_rows):
+    """
+    Run one stage and measure it. The process peak RSS only ever grows, so a stage
+    reports how far it raised the peak: 0 when it stayed under an earlier stage's.
+    """
+    peak_before = get_peak_rss_mb()
+    with count_queries() as counter:
+        start = time.perf_counter()
+        result = fn()
+        wall_time = time.perf_counter() - start
+
+    rows = count_rows(result) or 0
+    return {
+        "stage": name,
+        "wall_time_s": round(wall_time, 3),
+        "queries": counter["queries"],
+        "peak_rss_growth_mb": round(get_peak_rss_mb() - peak_before, 1),
+        "rows": rows,
+        "rows_per_s": round(rows / wall_time, 1) if wall_time else None,
+    }
+
+
+def run(scale="1k", seed=42, output=None, keep_data=False):
+    """
+    Benchmark the analytics jobs on a synthetic dataset of `scale` invoices
+    ("1k", "100k", "1m" or a number). Only runs on sites that allow tests.
+    """
+    if not (frappe.conf.allow_tests or frappe.conf.developer_mode):
+        frappe.throw("Benchmarks write synthetic data; run them on a test site (allow_tests or developer_mode).")
+
+    delete_synthetic_data()
+    started_on = now_datetime()
+    start = time.perf_counter()
+    generated = generate_synthetic_data(scale, seed)
+    generation_time = time.perf_counter() - start
+
+    try:
+        stages = [run_stage(*stage) for stage in STAGES]
+    finally:
+        if not keep_data:
+            delete_synthetic_data(since=started_on)
+
+    results = {
+        "scale": scale,
+        "seed": seed,
+        "site": frappe.local.site,
+        "timestamp": str(now_datetime()),
+        "peak_rss_mb": get_peak_rss_mb(),
+        "generated_rows": generated,
+        "generation_time_s": round(generation_time, 3),
+        "stages": stages,
+    }
+
+    output = output or frappe.get_site_path(
+        "private", "benchmarks", f"{now_datetime():%Y%m%d-%H%M%S}-{scale}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for stage in stages:
+        print(
+            f"{stage['stage']:<30} {stage['wall_time_s']:>10.3f}s {stage['queries']:>8} queries "
+            f"{stage['peak_rss_growth_mb']:>+8.1f} MB {stage['rows_per_s'] or 0:>12.1f} rows/s"
+        )
+    print(f"Results written to {output}")
+    return results
@@ -0,0 +1,174 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Seeded synthetic data generator for the benchmarks.
+
+Rows are bulk inserted straight into the ERPNext tables the analytics jobs read
+(no document lifecycle), all named with the BENCH- prefix so they can be removed
+again with `delete_synthetic_data`.
+"""
+
+import random
+from itertools import accumulate
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime, nowdate
+
+PREFIX = "BENCH-"
+
+# Invoice counts of the named scales
+SCALES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+# Invoices generated and inserted per batch
+BATCH_SIZE = 10_000
+
+# Days of sales history generated
+HISTORY_DAYS = 730
+
+# Standard columns filled on every generated row
+STANDARD_FIELDS = ("creation", "modified", "owner", "modified_by")
+
+# Synthetic rows of the jobs' own tables, keyed by the column that holds the BENCH- name
+DERIVED_TABLES = (
+    ("Customer RFM Score", "customer"),
+    ("Customer Monthly Fact", "customer"),
+    ("Customer RFM Features", "customer"),
+    ("RFM History", "customer"),
+    ("RFM Alert", "customer"),
+    ("RFM Rescore Queue", "customer"),
+    ("Item Analytics", "item_code"),
+    ("Item Monthly Sales", "item_code"),
+    ("Item Basket Analysis", "item_a"),
+)
+
+# Rows the benchmarked jobs write without any BENCH- column: (doctype, child table),
+# removed by the modified timestamp of the run
+RUN_TABLES = (
+    ("Analytics Run Log", "Analytics Run Log Stage"),
+    ("RFM Scoring Run", None),
+    ("RFM Segment Rollup", None),
+)
+
+SOURCE_TABLES = (
+    "Customer", "Item", "Bin", "Payment Terms Template", "Payment Terms Template Detail",
+    "Sales Invoice", "Sales Invoice Item", "Payment Entry", "Payment Entry Reference",
+)
+
+
+def standard_values():
+    now = now_datetime()
+    return (now, now, "Administrator", "Administrator")
+
+
+def get_scale_sizes(invoices):
+    """Customer and item counts that go with an invoice count"""
+    return frappe._dict(
+        invoices=invoices,
+        customers=max(20, invoices // 50),
+        items=max(50, invoices // 200),
+    )
+
+
+def generate_synthetic_data(scale="1k", seed=42):
+    """Insert a synthetic dataset of the given scale; returns the row counts per table"""
+    sizes = get_scale_sizes(SCALES[scale] if scale in SCALES else int(scale))
+    rng = random.Random(seed)
+    today = getdate(nowdate())
+    counts = dict.fromkeys(SOURCE_TABLES, 0)
+
+    def insert(doctype, fields, values):
+        if values:
+            frappe.db.bulk_insert(doctype, fields=[*fields, *STANDARD_FIELDS], values=[
+                (*row, *standard_values()) for row in values
+            ])
+            counts[doctype] += len(values)
+
+    # Payment terms: half of the customers get NET 30
+    insert("Payment Terms Template", ["name", "template_name"], [(f"{PREFIX}NET30", f"{PREFIX}NET30")])
+    insert("Payment Terms Template Detail",
+        ["name", "parent", "parenttype", "parentfield", "idx", "credit_days"],
+        [(f"{PREFIX}NET30-1", f"{PREFIX}NET30", "Payment Terms Template", "terms", 1, 30)])
+
+    customers = [f"{PREFIX}CUST-{i:07d}" for i in range(sizes.customers)]
+    insert("Customer", ["name", "customer_name", "payment_terms"], [
+        (c, f"Benchmark Customer {i}", f"{PREFIX}NET30" if i % 2 else None) for i, c in enumerate(customers)
+    ])
+
+    items = [f"{PREFIX}ITEM-{i:06d}" for i in range(sizes.items)]
+    prices = [round(rng.lognormvariate(3, 1), 2) for _ in items]
+    insert("Item", ["name", "item_code", "item_name"], [(it, it, f"Benchmark Item {i}") for i, it in enumerate(items)])
+    insert("Bin", ["name", "item_code", "warehouse", "actual_qty", "valuation_rate"], [
+        (f"{PREFIX}BIN-{i:06d}", it, f"{PREFIX}Stores", rng.randint(0, 500), round(prices[i] * 0.6, 2))
+        for i, it in enumerate(items)
+    ])
+
+    # Skewed popularity so the basket engine finds frequent pairs
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(items))))
+
+    for start in range(0, sizes.invoices, BATCH_SIZE):
+        invoice_rows, line_rows, payment_rows, reference_rows = [], [], [], []
+
+        for n in range(start, min(start + BATCH_SIZE, sizes.invoices)):
+            invoice = f"{PREFIX}SINV-{n:08d}"
+            posting_date = add_days(today, -rng.randint(0, HISTORY_DAYS))
+            due_date = add_days(posting_date, 30)
+
+            picked = set(rng.choices(range(len(items)), cum_weights=cum_weights, k=rng.randint(1, 6)))
+            grand_total = 0
+            for idx, i in enumerate(sorted(picked), 1):
+                qty = rng.randint(1, 10)
+                amount = round(qty * prices[i], 2)
+                grand_total += amount
+                line_rows.append((f"{invoice}-{idx}", invoice, "Sales Invoice", "items", idx, items[i], qty, amount, 1))
+
+            # ~70% paid, with a spread of early and late payments
+            paid = rng.random() < 0.7
+            invoice_rows.append((
+                invoice, rng.choice(customers), posting_date, due_date, grand_total,
+                0 if paid else grand_total, 1, 0,
+            ))
+            if paid:
+                payment = f"{PREFIX}PE-{n:08d}"
+                paid_on = add_days(due_date, rng.randint(-20, 60))
+                payment_rows.append((payment, paid_on, "Customer", invoice_rows[-1][1], 1))
+                reference_rows.append((f"{payment}-1", payment, "Payment Entry", "references", 1, "Sales Invoice", invoice, 1))
+
+        insert("Sales Invoice",
+            ["name", "customer", "posting_date", "due_date", "grand_total", "outstanding_amount", "docstatus", "is_return"],
+            invoice_rows)
+        insert("Sales Invoice Item",
+            ["name", "parent", "parenttype", "parentfield", "idx", "item_code", "qty", "base_net_amount", "docstatus"],
+            line_rows)
+        insert("Payment Entry", ["name", "posting_date", "party_type", "party", "docstatus"], payment_rows)
+        insert("Payment Entry Reference",
+            ["name", "parent", "parenttype", "parentfield", "idx", "reference_doctype", "reference_name", "docstatus"],
+            reference_rows)
+        frappe.db.commit()
+
+    return counts
+
+
+def delete_synthetic_data(since=None):
+    """
+    Remove every BENCH- row the generator or the benchmarked jobs wrote, and with
+    `since`, the RUN_TABLES rows written (or rewritten) from then on.
+    """
+    if since:
+        for doctype, child_doctype in RUN_TABLES:
+            if child_doctype:
+                frappe.db.sql(f"""
+                    DELETE child FROM `tab{child_doctype}` child
+                    JOIN `tab{doctype}` parent ON parent.name = child.parent
+                    WHERE parent.modified >= %s
+                """, (since,))
+            frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE modified >= %s", (since,))
+    for doctype, column in DERIVED_TABLES:
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE `{column}` LIKE %s", (f"{PREFIX}%",))
+    for doctype in SOURCE_TABLES:
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name LIKE %s", (f"{PREFIX}%",))
+    frappe.db.commit()
@@ -0,0 +1,63 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import now_datetime
+
+# Rows written per multi-row INSERT statement
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def bulk_upsert(doctype, rows, fields, preserve_on_null=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert or update `rows` (dicts carrying `name` plus `fields`) with multi-row
+    INSERT ... ON DUPLICATE KEY UPDATE statements, bypassing the document lifecycle.
+    Fields listed in `preserve_on_null` keep their stored value when the new value is NULL.
+    Does not commit.
+    """
+    if not rows:
+        return
+
+    preserve_on_null = set(preserve_on_null or ())
+    now = now_datetime()
+    user = frappe.session.user
+
+    columns = ["name", "owner", "creation", "modified", "modified_by", "docstatus", "idx", *fields]
+    column_sql = ", ".join(f"`{col}`" for col in columns)
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+    updates = ["`modified` = VALUES(`modified`)", "`modified_by` = VALUES(`modified_by`)"]
+    for field in fields:
+        if field in preserve_on_null:
+            updates.append(f"`{field}` = COALESCE(VALUES(`{field}`), `{field}`)")
+        else:
+            updates.append(f"`{field}` = VALUES(`{field}`)")
+    update_sql = ", ".join(updates)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        values = []
+        for row in chunk:
+            values.extend([row["name"], user, now, now, user, 0, 0])
+            values.extend(row.get(field) for field in fields)
+
+        frappe.db.sql(f"""
+            INSERT INTO `tab{doctype}` ({column_sql})
+            VALUES {", ".join([row_placeholder] * len(chunk))}
+            ON DUPLICATE KEY UPDATE {update_sql}
+        """, values)
+
+
+def reserve_names(prefix, count, digits=5):
+    """
+    Reserve `count` consecutive names of a naming series (e.g. "RFM-ALERT-" for
+    format:RFM-ALERT-{#####}) with one locked update of tabSeries, for bulk inserts.
+    Does not commit.
+    """
+    if count <= 0:
+        return []
+
+    frappe.db.sql("INSERT IGNORE INTO `tabSeries` (name, current) VALUES (%s, 0)", (prefix,))
+    current = frappe.db.sql("SELECT current FROM `tabSeries` WHERE name = %s FOR UPDATE", (prefix,))[0][0]
+    frappe.db.sql("UPDATE `tabSeries` SET current = %s WHERE name = %s", (current + count, prefix))
+    return [f"{prefix}{number:0{digits}d}" for number in range(current + 1, current + count + 1)]
@@ -0,0 +1,53 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Version-keyed Redis caching for the analytics endpoints.
+
+Every namespace has a version token; cached values are stored under
+"<namespace>:<version>:<key>". Writers invalidate a whole namespace by bumping
+its version, and stale entries simply expire.
+"""
+
+import frappe
+
+# Seconds a cached value lives even if its namespace is never invalidated
+DEFAULT_TTL = 6 * 60 * 60
+
+
+def get_cache_version(namespace):
+    """Current version token of a cache namespace"""
+    version = frappe.cache.get_value(f"erfmpnext:{namespace}:version")
+    if not version:
+        version = bump_cache_version(namespace)
+    return version
+
+
+def bump_cache_version(namespace):
+    """Invalidate every cached value of a namespace"""
+    version = frappe.generate_hash(length=10)
+    frappe.cache.set_value(f"erfmpnext:{namespace}:version", version)
+    return version
+
+
+def get_cached(namespace, key, builder, ttl=DEFAULT_TTL):
+    """Return the cached value of `key` for the current namespace version, building it on a miss"""
+    value = get_cached_value(namespace, key)
+    if value is None:
+        value = builder()
+        set_cached_value(namespace, key, value, ttl)
+    return value
+
+
+def get_cached_value(namespace, key):
+    """Cached value of `key` for the current namespace version, or None"""
+    return frappe.cache.get_value(get_cache_key(namespace, key))
+
+
+def set_cached_value(namespace, key, value, ttl=DEFAULT_TTL):
+    """Cache `value` under `key` for the current namespace version (e.g. from a warming job)"""
+    frappe.cache.set_value(get_cache_key(namespace, key), value, expires_in_sec=ttl)
+
+
+def get_cache_key(namespace, key):
+    return f"erfmpnext:{namespace}:{get_cache_version(namespace)}:{key}"
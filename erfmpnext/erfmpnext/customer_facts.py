@@ -0,0 +1,82 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Monthly customer facts: order count, spend and last purchase date per customer per month.
+
+Sales Invoice submit/cancel recomputes the affected customer-month, so scoring can
+build its analysis window from a bounded number of monthly rows instead of every
+invoice ever submitted. Rows are keyed by a unique (customer, month) index and
+named by a hash of that key, so long customer names always fit the name column.
+Rebuild everything with:
+    bench --site <site> execute erfmpnext.erfmpnext.customer_facts.rebuild_customer_facts
+"""
+
+import frappe
+from frappe.utils import getdate, now_datetime
+
+# Unique key of Customer Monthly Fact, which FACT_UPSERT upserts on
+FACT_UNIQUE_KEY = ("customer", "month")
+
+# Same measures as the original all-invoice aggregate: submitted invoices, returns included
+FACT_UPSERT = """
+    INSERT INTO `tabCustomer Monthly Fact` (
+        name, owner, creation, modified, modified_by, docstatus, idx,
+        customer, month, order_count, total_spent, last_purchase_date
+    )
+    SELECT
+        CONCAT('RFM-FACT-', SHA1(CONCAT(customer, '|', DATE_FORMAT(posting_date, '%%Y-%%m-01')))),
+        %(user)s, %(now)s, %(now)s, %(user)s, 0, 0,
+        customer,
+        DATE_FORMAT(posting_date, '%%Y-%%m-01') as month,
+        COUNT(DISTINCT name),
+        SUM(grand_total),
+        MAX(posting_date)
+    FROM `tabSales Invoice`
+    WHERE docstatus = 1 AND customer IS NOT NULL {condition}
+    GROUP BY customer, month
+    ON DUPLICATE KEY UPDATE
+        order_count = VALUES(order_count),
+        total_spent = VALUES(total_spent),
+        last_purchase_date = VALUES(last_purchase_date),
+        modified = VALUES(modified)
+"""
+
+
+def add_fact_unique_key():
+    """Unique (customer, month) index of Customer Monthly Fact (skipped when it exists)"""
+    frappe.db.add_unique("Customer Monthly Fact", list(FACT_UNIQUE_KEY), "erfm_customer_month_unique")
+
+
+def get_month_start(date):
+    return getdate(date).replace(day=1)
+
+
+def refresh_customer_facts(customer, months):
+    """Recompute the fact rows of one customer for the given months (no commit)"""
+    months = sorted({str(get_month_start(m)) for m in months if m})
+    if not customer or not months:
+        return
+
+    params = {"customer": customer, "months": months, "user": frappe.session.user, "now": now_datetime()}
+    # Months left without invoices disappear; concurrent refreshes of a month just overwrite each other
+    frappe.db.sql("""
+        DELETE FROM `tabCustomer Monthly Fact`
+        WHERE customer = %(customer)s AND month IN %(months)s
+    """, params)
+    frappe.db.sql(FACT_UPSERT.format(
+        condition="AND customer = %(customer)s AND DATE_FORMAT(posting_date, '%%Y-%%m-01') IN %(months)s"
+    ), params)
+
+
+def on_sales_invoice_change(doc, method=None):
+    """Keep the invoice's customer-month current; runs inside the submit/cancel transaction"""
+    refresh_customer_facts(doc.customer, [doc.posting_date])
+
+
+def rebuild_customer_facts():
+    """Maintenance command: rebuild every Customer Monthly Fact from the submitted Sales Invoices"""
+    frappe.db.delete("Customer Monthly Fact")
+    frappe.db.sql(FACT_UPSERT.format(condition=""), {"user": frappe.session.user, "now": now_datetime()})
+    frappe.db.commit()
+    return {"rows": frappe.db.count("Customer Monthly Fact")}
@@ -0,0 +1,24 @@
+# Analytics Run Log DocType
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class AnalyticsRunLog(Document):
+	@staticmethod
+	def clear_old_logs(days=30):
+		"""Delete run logs (and their stages) older than `days`, for Log Settings"""
+		frappe.db.sql(
+			"""
+			DELETE stage FROM `tabAnalytics Run Log Stage` stage
+			JOIN `tabAnalytics Run Log` log ON log.name = stage.parent
+			WHERE log.creation < DATE_SUB(NOW(), INTERVAL %(days)s DAY)
+			""",
+			{"days": days},
+		)
+		frappe.db.sql(
+			"DELETE FROM `tabAnalytics Run Log` WHERE creation < DATE_SUB(NOW(), INTERVAL %(days)s DAY)",
+			{"days": days},
+		)
@@ -6,4 +6,12 @@ from frappe.model.document import Document
 
 
 class RFMAlert(Document):
-	pass
+	def on_change(self):
+		from erfmpnext.erfmpnext.api import invalidate_dashboard_cache
+
+		invalidate_dashboard_cache()
+
+	def on_trash(self):
+		from erfmpnext.erfmpnext.api import invalidate_dashboard_cache
+
+		invalidate_dashboard_cache()
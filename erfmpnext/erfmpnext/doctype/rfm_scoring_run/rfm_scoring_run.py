@@ -0,0 +1,10 @@
+# RFM Scoring Run DocType
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class RFMScoringRun(Document):
+	pass
@@ -4,6 +4,19 @@
 import frappe
 from frappe.model.document import Document
 
+# Settings whose change rescoring from the stored features picks up
+THRESHOLD_FIELDS = (
+	"recency_days_5", "recency_days_4", "recency_days_3", "recency_days_2",
+	"frequency_orders_5", "frequency_orders_4", "frequency_orders_3", "frequency_orders_2",
+	"monetary_amount_5", "monetary_amount_4", "monetary_amount_3", "monetary_amount_2",
+	"payment_days_5", "payment_days_4", "payment_days_3", "payment_days_2",
+)
+
 
 class RFMSettings(Document):
-	pass
+	def on_update(self):
+		if any(self.has_value_changed(field) for field in THRESHOLD_FIELDS):
+			from erfmpnext.erfmpnext.orchestrator import enqueue_job
+
+			# A rescore already running read the old thresholds: run it again after it
+			frappe.db.after_commit.add(lambda: enqueue_job("rfm_rescore", rerun=True))
@@ -0,0 +1,158 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Incremental RFM recalculation.
+
+Sales Invoice and Payment Entry submit/cancel events mark their customer dirty in
+the RFM Rescore Queue; `process_rescore_queue` rescores only those customers.
+`refresh_time_based_scores` queues the customers whose scores move just because
+a day passed, and `calculate_rfm_scores` remains the periodic full reconciliation.
+"""
+
+import frappe
+from frappe.utils import add_days, cint, getdate, now_datetime, nowdate
+
+from erfmpnext.erfmpnext.api import (
+    enqueue_alert_digest,
+    get_rfm_thresholds,
+    get_score_from_thresholds,
+    score_customers,
+)
+from erfmpnext.erfmpnext.bulk import bulk_upsert
+from erfmpnext.erfmpnext.profiling import instrumented_job
+
+# Customers rescored (and committed) per batch when draining the queue
+RESCORE_BATCH_SIZE = 1000
+
+
+def mark_customers_dirty(customers, reference_doctype=None):
+    """Queue customers for rescoring. Runs inside the caller's transaction."""
+    customers = {c for c in customers if c}
+    if not customers:
+        return
+
+    now = now_datetime()
+    bulk_upsert(
+        "RFM Rescore Queue",
+        [
+            {"name": c, "customer": c, "reference_doctype": reference_doctype, "queued_on": now}
+            for c in customers
+        ],
+        ("customer", "reference_doctype", "queued_on"),
+    )
+
+
+def on_sales_invoice_change(doc, method=None):
+    """doc_events hook for Sales Invoice on_submit/on_cancel"""
+    mark_customers_dirty([doc.customer], doc.doctype)
+
+
+def on_payment_entry_change(doc, method=None):
+    """doc_events hook for Payment Entry on_submit/on_cancel"""
+    if doc.party_type == "Customer":
+        mark_customers_dirty([doc.party], doc.doctype)
+
+
+# Polled every few minutes: only runs that rescored someone are logged
+@instrumented_job("process_rescore_queue", log_empty_runs=False)
+def process_rescore_queue():
+    """Rescore every customer queued so far, one committed batch at a time"""
+    cutoff = now_datetime()
+    results = {"processed": 0, "alerts_created": 0}
+
+    while True:
+        customers = frappe.db.sql_list("""
+            SELECT name FROM `tabRFM Rescore Queue`
+            WHERE queued_on <= %(cutoff)s
+            ORDER BY queued_on
+            LIMIT %(limit)s
+        """, {"cutoff": cutoff, "limit": RESCORE_BATCH_SIZE})
+
+        if not customers:
+            break
+
+        batch = score_customers(customers)
+        results["processed"] += batch["processed"]
+        results["alerts_created"] += batch["alerts_created"]
+
+        # Entries re-queued by events after the cutoff stay for the next run
+        frappe.db.sql("""
+            DELETE FROM `tabRFM Rescore Queue`
+            WHERE name IN %(customers)s AND queued_on <= %(cutoff)s
+        """, {"customers": customers, "cutoff": cutoff})
+        frappe.db.commit()
+
+    if results["processed"]:
+        enqueue_alert_digest(cutoff)
+    return results
+
+
+@instrumented_job("refresh_time_based_scores")
+def refresh_time_based_scores():
+    """
+    Cheap daily pass replacing the full sweep: refresh days_since_purchase in place,
+    queue customers whose R score crossed a threshold, whose invoices left the analysis
+    window (F and M), whose open invoices matured or crossed a payment threshold
+    today, and customers without a score yet.
+    Then drain the queue.
+    """
+    settings = frappe.get_single("RFM Settings")
+    thresholds = get_rfm_thresholds(settings)
+    today = getdate(nowdate())
+
+    frappe.db.sql("""
+        UPDATE `tabCustomer RFM Score`
+        SET days_since_purchase = DATEDIFF(%(today)s, last_purchase_date)
+        WHERE last_purchase_date IS NOT NULL
+    """, {"today": today})
+
+    # Same first-match semantics as get_score_from_thresholds(reverse=False)
+    recency_case = " ".join(
+        f"WHEN DATEDIFF(%(today)s, last_purchase_date) <= %(r{i})s THEN {5 - i}"
+        for i in range(len(thresholds.recency))
+    )
+    params = {"today": today, "never": get_score_from_thresholds(9999, thresholds.recency)}
+    params.update({f"r{i}": t for i, t in enumerate(thresholds.recency)})
+
+    stale = frappe.db.sql_list(f"""
+        SELECT name FROM `tabCustomer RFM Score`
+        WHERE IFNULL(recency_score, 0) != CASE
+            WHEN last_purchase_date IS NULL THEN %(never)s
+            {recency_case}
+            ELSE 1
+        END
+    """, params)
+
+    # Open invoices change P score the day they mature and the day after each threshold
+    crossings = {0} | {int(t) + 1 for t in thresholds.payment}
+    stale += frappe.db.sql_list("""
+        SELECT DISTINCT customer FROM `tabSales Invoice`
+        WHERE docstatus = 1 AND is_return = 0
+            AND outstanding_amount > 0.1
+            AND DATEDIFF(%(today)s, due_date) IN %(crossings)s
+    """, {"today": today, "crossings": tuple(crossings)})
+
+    # F and M age out: invoices leaving the analysis window today. The window is summed
+    # over whole months of Customer Monthly Facts, so a month drops out on its 1st
+    # (the range is empty on every other day). Returns count in the facts too.
+    period_start = add_days(today, -(cint(settings.analysis_period_days) or 365))
+    stale += frappe.db.sql_list("""
+        SELECT DISTINCT customer FROM `tabSales Invoice`
+        WHERE docstatus = 1
+            AND posting_date >= %(dropped_from)s AND posting_date < %(window_start)s
+    """, {
+        "dropped_from": add_days(period_start, -1).replace(day=1),
+        "window_start": period_start.replace(day=1),
+    })
+
+    stale += frappe.db.sql_list("""
+        SELECT c.name FROM `tabCustomer` c
+        LEFT JOIN `tabCustomer RFM Score` s ON s.name = c.name
+        WHERE s.name IS NULL
+    """)
+
+    mark_customers_dirty(stale)
+    frappe.db.commit()
+
+    return process_rescore_queue()
@@ -0,0 +1,90 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Indexes backing the hot analytics queries, and an EXPLAIN-based diagnostic.
+
+Run the diagnostic with:
+    bench --site <site> execute erfmpnext.erfmpnext.indexes.explain_analytics_queries
+"""
+
+import frappe
+
+# (doctype, columns, index name) of the access paths the v1_0 add_analytics_indexes patch
+# adds to existing tables; later tables declare their own indexes in their own patches
+ANALYTICS_INDEXES = (
+    ("Sales Invoice", ("customer", "docstatus", "is_return", "posting_date"), "erfm_customer_status_date"),
+    ("Payment Entry Reference", ("reference_name",), "erfm_reference_name"),
+    ("RFM History", ("customer", "snapshot_date"), "erfm_customer_snapshot"),
+    ("Customer RFM Score", ("average_score",), "erfm_average_score"),
+    ("Sales Invoice Item", ("parent", "item_code"), "erfm_parent_item"),
+)
+
+
+def ensure_analytics_indexes():
+    """Create missing ANALYTICS_INDEXES (add_index skips existing ones)"""
+    for doctype, columns, index_name in ANALYTICS_INDEXES:
+        frappe.db.add_index(doctype, list(columns), index_name)
+
+
+def get_analytics_queries():
+    """
+    (label, query, params) of the queries the app issues, bound to sample rows.
+    Built from the same query constants and builders the jobs and endpoints use.
+    """
+    from erfmpnext.erfmpnext import api, market_basket, recommendations
+
+    customer = frappe.db.get_value("Sales Invoice", {"docstatus": 1}, "customer") or ""
+    invoice = frappe.db.get_value("Sales Invoice", {"docstatus": 1, "customer": customer}, "name") or ""
+    today = frappe.utils.nowdate()
+    params = {
+        "customers": [customer],
+        "invoices": [invoice],
+        "today": today,
+        "window_start": frappe.utils.add_months(today, -12),
+        "generation": api.get_basket_generation(),
+        "items": [frappe.db.get_value("Item Basket Analysis", {}, "item_a") or ""],
+    }
+
+    return [
+        ("Customer aggregates", api.CUSTOMER_AGGREGATES_QUERY.format(condition="WHERE c.name IN %(customers)s"), params),
+        ("Payment scoring invoices", api.PAYMENT_INVOICES_QUERY, params),
+        ("Last payment dates", api.LAST_PAYMENT_DATES_QUERY, params),
+        ("History snapshot anti-join", api.HISTORY_SNAPSHOT_QUERY, params),
+        # Builders render their values into the SQL
+        ("Customer trend", api.get_customer_history(customer, frappe.utils.add_days(today, -30), run=False), None),
+        # The customer list of the RFM dashboard page (frappe.client.get_list)
+        ("Dashboard customer list", frappe.get_all(
+            "Customer RFM Score", fields=["name", "average_score"], order_by="average_score desc", limit=20, run=False
+        ), None),
+        ("Product sales cube", api.PRODUCT_SALES_QUERY, params),
+        ("Basket invoice lines", market_basket.BASKET_LINES_QUERY, params),
+        ("Recommendation index", recommendations.RECOMMENDATION_QUERY, params),
+    ]
+
+
+def explain_analytics_queries():
+    """
+    EXPLAIN every analytics query. Returns the plan rows and, under "warnings",
+    the full table scans (also logged).
+    """
+    logger = frappe.logger("erfmpnext")
+    report = {"plans": [], "warnings": []}
+
+    for label, query, params in get_analytics_queries():
+        for row in frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True):
+            full_scan = row.get("type") == "ALL"
+            report["plans"].append({
+                "query": label,
+                "table": row.get("table"),
+                "access": row.get("type"),
+                "key": row.get("key"),
+                "rows": row.get("rows"),
+                "full_scan": full_scan,
+            })
+            if full_scan:
+                message = f"{label}: full scan of {row.get('table')} (~{row.get('rows')} rows)"
+                logger.warning(message)
+                report["warnings"].append(message)
+
+    return report
@@ -0,0 +1,144 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Memory-bounded association engine for calculate_market_basket.
+
+1. Item supports come from one grouped query; items below the minimum support
+   are pruned and the rest encoded as integer ids.
+2. Invoices are streamed in keyset pages as sorted tuples of frequent item ids.
+3. Pairs are counted in int-keyed dicts holding at most `max_counters` entries.
+   When the pair space does not fit, it is split into hash partitions of the
+   first item and counted in one streaming pass per partition
+   (see association.count_pairs).
+4. Optionally, larger itemsets are mined level by level (Apriori candidate
+   generation and pruning) up to `max_itemset_size`; a level whose candidates
+   exceed the counter budget is skipped with a warning.
+"""
+
+import frappe
+from frappe import _
+
+from erfmpnext.erfmpnext.association import (
+    DEFAULT_MAX_COUNTERS,
+    CounterBudgetExceeded,
+    count_itemsets,
+    count_pairs,
+)
+
+# Invoices fetched per streaming page
+INVOICE_PAGE_SIZE = 2000
+
+# Item lines of one page of invoices
+BASKET_LINES_QUERY = """
+    SELECT parent, item_code
+    FROM `tabSales Invoice Item`
+    WHERE parent IN %(invoices)s AND docstatus = 1
+"""
+
+
+def get_min_support_count(total_invoices):
+    """Minimum number of invoices an itemset must appear in"""
+    return max(2, total_invoices * 0.01) # Lower threshold for basket
+
+
+def mine_frequent_itemsets(max_itemset_size=2, max_counters=DEFAULT_MAX_COUNTERS):
+    """
+    Mine the frequent itemsets of submitted Sales Invoices, up to `max_itemset_size`
+    items (pairs only by default). Returns a dict with total_invoices,
+    min_support_count, item_support {item_code: invoice count}, pairs
+    {(item_code, item_code): invoice count} and itemsets {size: {(item_code, ...): invoice count}}
+    for the sizes above 2.
+    """
+    total_invoices = frappe.db.sql("""
+        SELECT COUNT(DISTINCT parent) FROM `tabSales Invoice Item` WHERE docstatus = 1
+    """)[0][0] or 0
+    result = frappe._dict(
+        total_invoices=total_invoices,
+        min_support_count=get_min_support_count(total_invoices),
+        item_support={},
+        pairs={},
+        itemsets={},
+        partitions=1,
+    )
+    if not total_invoices:
+        return result
+
+    # Prune infrequent items before any pair is generated
+    item_support = frappe.db.sql("""
+        SELECT item_code, COUNT(DISTINCT parent) as support
+        FROM `tabSales Invoice Item`
+        WHERE docstatus = 1
+        GROUP BY item_code
+        HAVING support >= %(min_support)s
+    """, {"min_support": result.min_support_count})
+    result.item_support = dict(item_support)
+
+    item_codes = sorted(result.item_support)
+    item_ids = {item_code: i for i, item_code in enumerate(item_codes)}
+    if len(item_codes) < 2:
+        return result
+
+    def on_split(partitions):
+        result.partitions = partitions
+        frappe.logger("erfmpnext").info(
+            f"Market basket: {max_counters} pair counters exceeded, counting in {partitions} partitions"
+        )
+
+    n = len(item_codes)
+    try:
+        pair_counts = count_pairs(
+            lambda: iter_baskets(item_ids), n, result.min_support_count, max_counters, on_split
+        )
+    except CounterBudgetExceeded:
+        frappe.throw(_("Market basket memory budget is too small for a single item's pairs"))
+
+    result.pairs = {
+        (item_codes[key // n], item_codes[key % n]): count for key, count in pair_counts.items()
+    }
+
+    frequent = {(key // n, key % n) for key in pair_counts}
+    for size in range(3, (max_itemset_size or 2) + 1):
+        try:
+            frequent = count_itemsets(
+                lambda: iter_baskets(item_ids), frequent, size, result.min_support_count, max_counters
+            )
+        except CounterBudgetExceeded:
+            frappe.logger("erfmpnext").warning(
+                f"Market basket: {size}-itemset candidates exceed {max_counters} counters, "
+                f"itemsets stop at size {size - 1}"
+            )
+            break
+        if not frequent:
+            break
+        result.itemsets[size] = {
+            tuple(item_codes[i] for i in itemset): count for itemset, count in frequent.items()
+        }
+
+    return result
+
+
+def iter_baskets(item_ids):
+    """Stream submitted invoices as sorted tuples of (frequent) item ids"""
+    last_invoice = ""
+    while True:
+        invoices = frappe.db.sql_list("""
+            SELECT name FROM `tabSales Invoice`
+            WHERE name > %(last_invoice)s AND docstatus = 1
+            ORDER BY name
+            LIMIT %(limit)s
+        """, {"last_invoice": last_invoice, "limit": INVOICE_PAGE_SIZE})
+        if not invoices:
+            return
+
+        baskets = {}
+        for parent, item_code in frappe.db.sql(BASKET_LINES_QUERY, {"invoices": invoices}):
+            item_id = item_ids.get(item_code)
+            if item_id is not None:
+                baskets.setdefault(parent, set()).add(item_id)
+
+        for items in baskets.values():
+            if len(items) > 1:
+                yield tuple(sorted(items))
+
+        last_invoice = invoices[-1]
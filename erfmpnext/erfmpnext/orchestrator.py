@@ -0,0 +1,309 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Orchestration of the analytics jobs.
+
+A single nightly cron entry starts a pipeline: RFM scoring, then the history
+snapshot and the threshold simulator's feature vectors once scoring has finished,
+with product analytics running independently.
+Every job runs under a Redis lock so only one run of it exists at a time; a job
+finding its lock taken waits for it and is enqueued again when the holder
+releases it. Enqueues are deduplicated by job id, and `get_analytics_status`
+reports what is queued, running and how the last run of each job ended. Running
+jobs publish their progress as realtime PROGRESS_EVENT messages.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import getdate, nowdate
+from frappe.utils.background_jobs import is_job_enqueued
+
+# Background job timeout (seconds), also the lifetime of a job lock
+JOB_TIMEOUT = 4 * 60 * 60
+
+# Seconds a pipeline's dependency state is kept
+PIPELINE_TTL = 24 * 60 * 60
+
+# Job name -> method it runs
+JOBS = {
+    "rfm_scoring": "erfmpnext.erfmpnext.incremental.refresh_time_based_scores",
+    "rfm_reconciliation": "erfmpnext.erfmpnext.api.run_rfm_scoring",
+    "rescore_queue": "erfmpnext.erfmpnext.incremental.process_rescore_queue",
+    "rfm_rescore": "erfmpnext.erfmpnext.api.rescore_from_features",
+    "history_snapshot": "erfmpnext.erfmpnext.api.create_history_snapshot",
+    "product_analytics": "erfmpnext.erfmpnext.api.calculate_product_analytics",
+    "simulation_vectors": "erfmpnext.erfmpnext.simulation.warm_feature_vectors",
+}
+
+# Jobs writing the same scores share one lock
+JOB_LOCKS = {
+    "rfm_reconciliation": "rfm_scoring",
+    "rescore_queue": "rfm_scoring",
+    "rfm_rescore": "rfm_scoring",
+}
+
+# Realtime event carrying {job, job_id, stage, processed, total, status}; status is
+# Running, Waiting (for the lock), Completed, Failed or Skipped (already waiting)
+PROGRESS_EVENT = "erfmpnext_job_progress"
+
+# Weekday (Monday is 0) on which the nightly scoring is a full reconciliation
+RECONCILIATION_WEEKDAY = 6
+
+# Compare-and-delete, so a job never releases a lock another run has taken over
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_nightly_pipeline(today):
+    """Dependency graph of the nightly run: job -> jobs it waits for"""
+    scoring = "rfm_reconciliation" if today.weekday() == RECONCILIATION_WEEKDAY else "rfm_scoring"
+    return {
+        scoring: (),
+        "history_snapshot": (scoring,),
+        "simulation_vectors": (scoring,),
+        "product_analytics": (),
+    }
+
+
+def run_nightly_analytics():
+    """Scheduler entry point: start today's nightly pipeline"""
+    return start_pipeline(get_nightly_pipeline(getdate(nowdate())))
+
+
+def run_rescore_queue():
+    """Scheduler entry point: drain the rescore queue unless scoring is already running"""
+    return run_job("rescore_queue")
+
+
+def start_pipeline(graph):
+    """Enqueue the jobs of a dependency graph that wait for nothing; the rest follow as they finish"""
+    pipeline = frappe.generate_hash(length=10)
+    frappe.cache.set_value(get_pipeline_key(pipeline), graph, expires_in_sec=PIPELINE_TTL)
+    return {
+        "pipeline": pipeline,
+        "jobs": [enqueue_job(job, pipeline) for job, depends_on in graph.items() if not depends_on],
+    }
+
+
+def enqueue_job(job, pipeline=None, rerun=False, **kwargs):
+    """
+    Enqueue one analytics job on the long queue unless it is already queued or
+    running. With `rerun`, a job that is already running runs again once it
+    finishes (e.g. to pick up settings saved while it was running).
+    """
+    result = enqueue_job_as(get_job_id(job), job, pipeline, kwargs)
+    if rerun and not result["queued"] and get_lock_holder(job) == job:
+        frappe.cache.hset(get_waiting_key(job), job, {"pipeline": pipeline, "kwargs": kwargs})
+        frappe.cache.expire(frappe.cache.make_key(get_waiting_key(job)), JOB_TIMEOUT)
+        # The running job may have released its lock before the rerun was registered
+        if get_lock_holder(job) != job:
+            enqueue_waiting_jobs(job)
+        result["rerun"] = True
+    return result
+
+
+def enqueue_job_as(job_id, job, pipeline, kwargs):
+    queued = frappe.enqueue(
+        "erfmpnext.erfmpnext.orchestrator.run_job",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        job_id=job_id,
+        deduplicate=True,
+        job=job,
+        pipeline=pipeline,
+        **kwargs,
+    )
+    return {"job": job, "job_id": job_id, "queued": bool(queued)}
+
+
+def run_job(job, pipeline=None, **kwargs):
+    """Run one analytics job under its lock, then start the pipeline jobs waiting for it"""
+    token = acquire_lock(job) or wait_for_lock(job, pipeline, kwargs)
+    if not token:
+        return {"job": job, "waiting": True}
+
+    context = {"job": job, "pipeline": pipeline, "token": token, "deferred": False}
+    frappe.local.erfmpnext_job = job
+    frappe.local.erfmpnext_job_context = context
+    publish_progress(_("Started"))
+    try:
+        result = frappe.get_attr(JOBS[job])(**kwargs)
+    except Exception:
+        if not context["deferred"]:
+            release_lock(job, token)
+            publish_progress(_("Failed"), status="Failed")
+        raise
+    finally:
+        frappe.local.erfmpnext_job = None
+        frappe.local.erfmpnext_job_context = None
+
+    # Sharded scoring goes on in shard jobs; the job finishes with its scoring run
+    if not context["deferred"]:
+        finish_job(job, pipeline, token, processed=result.get("processed") if isinstance(result, dict) else None)
+    return result
+
+
+def wait_for_lock(job, pipeline, kwargs):
+    """
+    Register a job whose lock is taken, to be enqueued again once the holder
+    releases it. Returns a lock token if the lock freed up in the meantime.
+    """
+    waiting_key = get_waiting_key(job)
+    waiting = frappe.cache.hget(waiting_key, job)
+    if waiting and waiting["pipeline"] == pipeline:
+        publish_progress(_("Already waiting for the lock"), job=job, status="Skipped")
+        return None
+
+    frappe.cache.hset(waiting_key, job, {"pipeline": pipeline, "kwargs": kwargs})
+    frappe.cache.expire(frappe.cache.make_key(waiting_key), JOB_TIMEOUT)
+    # The holder may have released the lock before the job was registered
+    token = acquire_lock(job)
+    if token:
+        frappe.cache.hdel(waiting_key, job)
+        return token
+
+    holder = get_lock_holder(job)
+    frappe.logger("erfmpnext").info(f"Analytics job {job} waiting for {holder}")
+    publish_progress(_("Waiting for {0}").format(holder or _("another job")), job=job, status="Waiting")
+    return None
+
+
+def enqueue_waiting_jobs(job):
+    """Enqueue every job waiting for the lock `job` uses"""
+    waiting_key = get_waiting_key(job)
+    for waiting_job, waiting in frappe.cache.hgetall(waiting_key).items():
+        waiting_job = frappe.safe_decode(waiting_job)
+        frappe.cache.hdel(waiting_key, waiting_job)
+        # Own job id: the waiting job's original run may still be finishing
+        enqueue_job_as(get_waiting_job_id(waiting_job), waiting_job, waiting["pipeline"], waiting["kwargs"])
+
+
+def defer_job_finish(run_name):
+    """
+    Keep the running job's lock until the sharded RFM Scoring Run `run_name`
+    finishes (see on_scoring_run_finished). Call before dispatching its shards,
+    so a shard finishing early still finds the job to finish.
+    """
+    context = getattr(frappe.local, "erfmpnext_job_context", None)
+    if not context:
+        return
+    frappe.cache.set_value(
+        get_scoring_run_key(run_name),
+        {"job": context["job"], "pipeline": context["pipeline"], "token": context["token"]},
+        expires_in_sec=JOB_TIMEOUT,
+    )
+    context["deferred"] = True
+
+
+def on_scoring_run_finished(run_name, succeeded):
+    """Called when a sharded RFM Scoring Run completes or fails"""
+    pending = frappe.cache.get_value(get_scoring_run_key(run_name))
+    if not pending:
+        return
+    frappe.cache.delete_value(get_scoring_run_key(run_name))
+    processed = frappe.db.get_value("RFM Scoring Run", run_name, "processed")
+    finish_job(pending["job"], pending["pipeline"], pending["token"], succeeded, processed)
+
+
+def finish_job(job, pipeline, token, succeeded=True, processed=None):
+    """Release the job's lock and enqueue the pipeline jobs whose dependencies are now all done"""
+    release_lock(job, token)
+    status = "Completed" if succeeded else "Failed"
+    publish_progress(_(status), processed=processed, job=job, status=status)
+    if not (succeeded and pipeline):
+        return
+
+    graph = frappe.cache.get_value(get_pipeline_key(pipeline))
+    if not graph:
+        return
+
+    done_key = f"{get_pipeline_key(pipeline)}:done"
+    frappe.cache.sadd(done_key, job)
+    frappe.cache.expire(frappe.cache.make_key(done_key), PIPELINE_TTL)
+    done = {frappe.safe_decode(member) for member in frappe.cache.smembers(done_key)}
+
+    for dependent, depends_on in graph.items():
+        if job in depends_on and set(depends_on) <= done:
+            enqueue_job(dependent, pipeline)
+
+
+def publish_progress(stage, processed=None, total=None, job=None, status="Running"):
+    """Publish the progress of the running analytics job (no-op outside an orchestrated job)"""
+    job = job or getattr(frappe.local, "erfmpnext_job", None)
+    if not job:
+        return
+    frappe.publish_realtime(PROGRESS_EVENT, {
+        "job": job,
+        "job_id": get_job_id(job),
+        "stage": stage,
+        "processed": processed,
+        "total": total,
+        "status": status,
+    })
+
+
+def acquire_lock(job):
+    """Take the job's lock; returns its token, or None when another run holds it"""
+    token = f"{job}:{frappe.generate_hash(length=10)}"
+    if frappe.cache.set(get_lock_key(job), token, nx=True, ex=JOB_TIMEOUT):
+        return token
+
+
+def release_lock(job, token):
+    frappe.cache.eval(RELEASE_LOCK_SCRIPT, 1, get_lock_key(job), token)
+    enqueue_waiting_jobs(job)
+
+
+def get_lock_holder(job):
+    """Job currently holding the lock `job` uses, if any"""
+    token = frappe.safe_decode(frappe.cache.get(get_lock_key(job)) or "")
+    return token.split(":", 1)[0] or None
+
+
+def get_lock_key(job):
+    return frappe.cache.make_key(f"erfmpnext:lock:{JOB_LOCKS.get(job, job)}")
+
+
+def get_job_id(job):
+    return f"erfmpnext-analytics::{job}"
+
+
+def get_waiting_job_id(job):
+    return f"{get_job_id(job)}::after-lock"
+
+
+def get_waiting_key(job):
+    return f"erfmpnext:lock-waiting:{JOB_LOCKS.get(job, job)}"
+
+
+def get_pipeline_key(pipeline):
+    return f"erfmpnext:pipeline:{pipeline}"
+
+
+def get_scoring_run_key(run_name):
+    return f"erfmpnext:pipeline-scoring-run:{run_name}"
+
+
+@frappe.whitelist()
+def get_analytics_status():
+    """Per analytics job: whether it is enqueued or running, and its last Analytics Run Log"""
+    status = {}
+    for job, method in JOBS.items():
+        last_run = frappe.get_all("Analytics Run Log",
+            filters={"job": method.rsplit(".", 1)[-1]},
+            fields=["name", "status", "started_on", "finished_on", "total_duration"],
+            order_by="creation desc",
+            limit=1,
+        )
+        status[job] = {
+            "enqueued": is_job_enqueued(get_job_id(job)) or is_job_enqueued(get_waiting_job_id(job)),
+            "waiting": bool(frappe.cache.hget(get_waiting_key(job), job)),
+            "running": get_lock_holder(job) == job,
+            "last_run": last_run[0] if last_run else None,
+        }
+    return status
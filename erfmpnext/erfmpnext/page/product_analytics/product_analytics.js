@@ -7,20 +7,12 @@ frappe.pages['product-analytics'].on_page_load = function (wrapper) {
 
     // Add Calculate button
     page.set_primary_action('Calculate Product Analytics', () => {
-        frappe.call({
-            method: 'erfmpnext.erfmpnext.api.calculate_product_analytics',
-            freeze: true,
-            freeze_message: 'Analyzing sales & stock patterns...',
-            callback: function (r) {
-                if (r.message && r.message.processed) {
-                    frappe.show_alert({
-                        message: `Processed ${r.message.processed} items successfully.`,
-                        indicator: 'green'
-                    });
-                    load_product_dashboard(page);
-                }
-            }
-        });
+        erfmpnext.run_analytics_job(
+            'erfmpnext.erfmpnext.api.enqueue_product_analytics',
+            'product_analytics',
+            'Analyzing sales & stock patterns',
+            () => load_product_dashboard(page)
+        );
     });
 
     load_product_dashboard(page);
@@ -152,17 +144,13 @@ function load_product_dashboard(page) {
 
 function load_matrix_data() {
     frappe.call({
-        method: 'frappe.client.get_list',
-        args: {
-            doctype: 'Item Analytics',
-            fields: ['abc_category', 'xyz_category']
-        },
+        method: 'erfmpnext.erfmpnext.api.get_product_matrix',
         callback: function (r) {
-            const counts = {};
-            (r.message || []).forEach(item => {
-                const key = (item.abc_category + item.xyz_category).toLowerCase();
-                counts[key] = (counts[key] || 0) + 1;
-            });
+            const cells = (r.message && r.message.cells) || {};
+            const cell = key => {
+                const values = cells[key] || { items: 0, revenue: 0 };
+                return `${values.items} items<br>${format_price(values.revenue)}`;
+            };
 
             const grid = `
                 <div class="matrix-grid">
@@ -172,41 +160,41 @@ function load_matrix_data() {
                     
                     <div class="matrix-cell cell-ax">
                         <span class="cell-label">AX</span>
-                        <span class="cell-count">${counts.ax || 0} items</span>
+                        <span class="cell-count">${cell('AX')}</span>
                     </div>
                     <div class="matrix-cell cell-ay">
                         <span class="cell-label">AY</span>
-                        <span class="cell-count">${counts.ay || 0} items</span>
+                        <span class="cell-count">${cell('AY')}</span>
                     </div>
                     <div class="matrix-cell cell-az">
                         <span class="cell-label">AZ</span>
-                        <span class="cell-count">${counts.az || 0} items</span>
+                        <span class="cell-count">${cell('AZ')}</span>
                     </div>
 
                     <div class="matrix-cell cell-bx">
                         <span class="cell-label">BX</span>
-                        <span class="cell-count">${counts.bx || 0} items</span>
+                        <span class="cell-count">${cell('BX')}</span>
                     </div>
                     <div class="matrix-cell cell-by">
                         <span class="cell-label">BY</span>
-                        <span class="cell-count">${counts.by || 0} items</span>
+                        <span class="cell-count">${cell('BY')}</span>
                     </div>
                     <div class="matrix-cell cell-bz">
                         <span class="cell-label">BZ</span>
-                        <span class="cell-count">${counts.bz || 0} items</span>
+                        <span class="cell-count">${cell('BZ')}</span>
                     </div>
 
                     <div class="matrix-cell cell-cx">
                         <span class="cell-label">CX</span>
-                        <span class="cell-count">${counts.cx || 0} items</span>
+                        <span class="cell-count">${cell('CX')}</span>
                     </div>
                     <div class="matrix-cell cell-cy">
                         <span class="cell-label">CY</span>
-                        <span class="cell-count">${counts.cy || 0} items</span>
+                        <span class="cell-count">${cell('CY')}</span>
                     </div>
                     <div class="matrix-cell cell-cz">
                         <span class="cell-label">CZ</span>
-                        <span class="cell-count">${counts.cz || 0} items</span>
+                        <span class="cell-count">${cell('CZ')}</span>
                     </div>
 
                     <div class="matrix-axis-label" style="grid-row: 4; grid-column: 2;">X (Steady)</div>
@@ -221,11 +209,8 @@ function load_matrix_data() {
 
 function load_basket_data() {
     frappe.call({
-        method: 'frappe.client.get_list',
+        method: 'erfmpnext.erfmpnext.api.get_basket_rules',
         args: {
-            doctype: 'Item Basket Analysis',
-            fields: ['item_a_name', 'item_b_name', 'confidence', 'support'],
-            order_by: 'confidence desc',
             limit: 10
         },
         callback: function (r) {
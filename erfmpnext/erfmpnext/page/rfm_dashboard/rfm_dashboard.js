@@ -7,28 +7,12 @@ frappe.pages['rfm-dashboard'].on_page_load = function (wrapper) {
 
     // Add Calculate button
     page.set_primary_action('Calculate RFMP Scores', () => {
-        frappe.call({
-            method: 'erfmpnext.erfmpnext.api.calculate_rfm_scores',
-            freeze: true,
-            freeze_message: 'Calculating RFMP scores...',
-            callback: function (r) {
-                if (r.message) {
-                    frappe.msgprint({
-                        title: 'RFMP Calculation Complete',
-                        message: `Processed ${r.message.processed} customers. Created ${r.message.alerts_created} alerts.`,
-                        indicator: 'green'
-                    });
-                    load_dashboard(page);
-                }
-            },
-            error: function (r) {
-                frappe.msgprint({
-                    title: 'Calculation Error',
-                    message: JSON.stringify(r),
-                    indicator: 'red'
-                });
-            }
-        });
+        erfmpnext.run_analytics_job(
+            'erfmpnext.erfmpnext.api.enqueue_rfm_scoring',
+            'rfm_reconciliation',
+            'Calculating RFMP scores',
+            () => load_dashboard(page)
+        );
     });
 
     // Add Product Analytics button
@@ -47,6 +31,7 @@ frappe.pages['rfm-dashboard'].on_page_load = function (wrapper) {
 function load_dashboard(page) {
     page.body.html(`
         <div class="rfmp-dashboard">
+            <div class="row" id="kpi-row"></div>
             <div class="row">
                 <div class="col-md-6">
                     <div class="card mb-4">
@@ -213,20 +198,14 @@ function load_dashboard(page) {
         </style>
     `);
 
-    // Load segment distribution
+    // Load distribution, KPIs and alerts in one (server-cached) call
     frappe.call({
-        method: 'erfmpnext.erfmpnext.api.get_segment_distribution',
+        method: 'erfmpnext.erfmpnext.api.get_dashboard_summary',
         callback: function (r) {
-            if (r.message) render_segment_chart(r.message);
-        }
-    });
-
-    // Load alerts
-    frappe.call({
-        method: 'erfmpnext.erfmpnext.api.get_alerts',
-        args: { limit: 10, unread_only: false },
-        callback: function (r) {
-            render_alerts(r.message || []);
+            if (!r.message) return;
+            render_kpis(r.message.kpis || {}, r.message.unread_alerts || 0);
+            render_segment_chart(r.message.distribution || []);
+            render_alerts(r.message.recent_alerts || []);
         }
     });
 
@@ -246,6 +225,30 @@ function load_dashboard(page) {
 }
 
 
+function render_kpis(kpis, unread_alerts) {
+    const tiles = [
+        { label: 'Scored Customers', value: kpis.customers || 0 },
+        { label: 'Average Score', value: (kpis.avg_score || 0).toFixed(1) },
+        { label: 'At Risk (< 2)', value: kpis.at_risk || 0 },
+        { label: 'Unread Alerts', value: unread_alerts }
+    ];
+
+    let html = '';
+    tiles.forEach(t => {
+        html += `
+            <div class="col-md-3">
+                <div class="card mb-4">
+                    <div class="card-body text-center">
+                        <div class="text-muted" style="font-size: 12px;">${t.label}</div>
+                        <div style="font-size: 24px; font-weight: 700;">${t.value}</div>
+                    </div>
+                </div>
+            </div>
+        `;
+    });
+    $('#kpi-row').html(html);
+}
+
 function render_segment_chart(data) {
     const colors = {
         'Excellent (5)': '#10b981',
@@ -0,0 +1,62 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""Columnar helpers for calculate_product_analytics"""
+
+import frappe
+import numpy as np
+from frappe.utils import add_months, flt, get_first_day
+
+# Month slots of the XYZ demand matrix
+XYZ_MONTHS = 12
+
+
+def get_month_slots(today, months=XYZ_MONTHS):
+    """First day of each of the last `months` calendar months, oldest first, ending with today's month"""
+    current_month = get_first_day(today)
+    return [add_months(current_month, offset) for offset in range(1 - months, 1)]
+
+
+def summarize_monthly_sales(monthly_rows):
+    """Per-item revenue, sales_qty and invoice_count totals of Item Monthly Sales rows, in row order"""
+    totals = {}
+    for row in monthly_rows:
+        item = totals.get(row.item_code)
+        if not item:
+            item = totals[row.item_code] = frappe._dict(item_code=row.item_code, revenue=0, sales_qty=0, invoice_count=0)
+        item.revenue += flt(row.revenue)
+        item.sales_qty += flt(row.qty)
+        item.invoice_count += row.invoice_count or 0
+    return list(totals.values())
+
+
+def build_month_matrix(item_codes, month_slots, monthly_rows, value_field="qty"):
+    """
+    Item x month matrix with one explicit column per month slot, so a month without
+    sales is a zero in its own slot. `monthly_rows` carry item_code, month (first day)
+    and `value_field`; rows outside the items or slots are ignored.
+    """
+    item_index = {item_code: i for i, item_code in enumerate(item_codes)}
+    slot_index = {month: j for j, month in enumerate(month_slots)}
+    matrix = np.zeros((len(item_codes), len(month_slots)))
+
+    for row in monthly_rows:
+        i = item_index.get(row.item_code)
+        j = slot_index.get(row.month)
+        if i is not None and j is not None:
+            matrix[i, j] += float(row.get(value_field) or 0)
+
+    return matrix
+
+
+def classify_xyz(matrix):
+    """
+    Coefficient of variation and X/Y/Z class of every matrix row in one pass.
+    Population standard deviation over all month slots (statistics.pstdev semantics);
+    items with no positive mean demand get CV 0 and class Z.
+    """
+    mean = matrix.mean(axis=1)
+    std = matrix.std(axis=1)
+    cv = np.divide(std, mean, out=np.zeros_like(mean), where=mean > 0)
+    xyz = np.where(mean > 0, np.where(cv < 0.5, "X", np.where(cv <= 1.0, "Y", "Z")), "Z")
+    return cv, xyz
@@ -0,0 +1,158 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Lightweight per-stage instrumentation for the analytics jobs.
+
+Jobs decorated with `instrumented_job` open a run; code inside marks its stages with
+`with stage("payment_scoring") as s: ... s["rows"] = n`. Repeated stages (one per chunk)
+are summed. Each run is persisted as an Analytics Run Log with per-stage durations,
+SQL query counts and row counts. Outside a run, `stage` is a no-op.
+Logs are cleared after the retention configured in Log Settings.
+
+Ticking "Profile Next Run" in RFM Settings dumps cProfile stats of the next run
+to the site's private files and records the path on its log.
+"""
+
+import cProfile
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+
+
+@contextmanager
+def count_queries():
+    """Count frappe.db.sql calls (every frappe.db helper goes through it) inside the block"""
+    counter = {"queries": 0}
+    original_sql = frappe.db.sql
+    # Nested blocks (an instrumented job inside a benchmark) restore the outer wrapper
+    nested = "sql" in vars(frappe.db)
+
+    def counting_sql(*args, **kwargs):
+        counter["queries"] += 1
+        return original_sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        if nested:
+            frappe.db.sql = original_sql
+        else:
+            del frappe.db.sql
+
+
+def get_current_run():
+    return getattr(frappe.local, "erfmpnext_analytics_run", None)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current run; yields a dict whose "rows" the caller may set"""
+    run = get_current_run()
+    metrics = {"rows": 0}
+    if not run:
+        yield metrics
+        return
+
+    queries_before = run["counter"]["queries"]
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        totals = run["stages"].setdefault(name, {"duration": 0.0, "queries": 0, "rows": 0, "calls": 0})
+        totals["duration"] += time.perf_counter() - start
+        totals["queries"] += run["counter"]["queries"] - queries_before
+        totals["rows"] += metrics["rows"] or 0
+        totals["calls"] += 1
+
+
+def instrumented_job(job, log_empty_runs=True):
+    """
+    Decorator opening an instrumented run around an analytics job. A job called
+    inside another job's run (e.g. market basket from product analytics) is
+    recorded as a stage of that run instead. Without `log_empty_runs`, completed
+    runs that processed nothing (e.g. a frequent poll finding no work) are not logged.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if get_current_run():
+                with stage(job):
+                    return fn(*args, **kwargs)
+            return run_instrumented(job, fn, *args, log_empty_runs=log_empty_runs, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_instrumented(job, fn, *args, log_empty_runs=True, **kwargs):
+    profiler = None
+    if frappe.db.get_single_value("RFM Settings", "profile_next_run"):
+        frappe.db.set_single_value("RFM Settings", "profile_next_run", 0)
+        frappe.db.commit()
+        profiler = cProfile.Profile()
+
+    started_on = now_datetime()
+    start = time.perf_counter()
+    status, error, result = "Completed", None, None
+
+    with count_queries() as counter:
+        frappe.local.erfmpnext_analytics_run = {"counter": counter, "stages": {}}
+        try:
+            if profiler:
+                profiler.enable()
+            result = fn(*args, **kwargs)
+            return result
+        except Exception:
+            status, error = "Failed", frappe.get_traceback()
+            frappe.db.rollback()
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            run = frappe.local.erfmpnext_analytics_run
+            frappe.local.erfmpnext_analytics_run = None
+            if log_empty_runs or profiler or status != "Completed" or not is_empty_result(result):
+                save_run_log(
+                    job, status, error, started_on, time.perf_counter() - start,
+                    counter["queries"], run["stages"], profiler,
+                )
+
+
+def is_empty_result(result):
+    """Whether a job result reports nothing processed"""
+    return isinstance(result, dict) and not result.get("processed")
+
+
+def save_run_log(job, status, error, started_on, duration, queries, stages, profiler=None):
+    """Persist one run as an Analytics Run Log"""
+    log = frappe.new_doc("Analytics Run Log")
+    log.job = job
+    log.status = status
+    log.error = error
+    log.started_on = started_on
+    log.finished_on = now_datetime()
+    log.total_duration = duration
+    log.total_queries = queries
+    for name, totals in stages.items():
+        log.append("stages", {
+            "stage": name,
+            "duration": totals["duration"],
+            "queries": totals["queries"],
+            "rows": totals["rows"],
+            "calls": totals["calls"],
+        })
+    log.insert(ignore_permissions=True)
+
+    if profiler:
+        path = frappe.get_site_path("private", "files", f"{log.name}.prof")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        log.db_set("profile_file", path)
+
+    frappe.db.commit()
+    return log
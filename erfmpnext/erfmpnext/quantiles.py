@@ -0,0 +1,105 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Mergeable quantile sketch for the Auto Quantile threshold mode.
+
+`QuantileSketch` is a DDSketch: values are counted in logarithmic buckets, so any
+quantile is returned within `relative_accuracy` of a true value of that rank,
+memory grows with the log of the value range rather than the number of values,
+and two sketches (e.g. of two scoring shards) merge by adding bucket counts.
+Sketches serialize to plain dicts for checkpointing in an RFM Scoring Run.
+"""
+
+import math
+
+# Quantiles are returned within 1% of a value of the requested rank
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values closer to zero than this are counted as zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def get_key(self, value):
+        """Bucket of a positive value: bucket k holds (gamma^(k-1), gamma^k]"""
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def get_value(self, key):
+        """Representative value of bucket k, within relative_accuracy of all its values"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """Count `value` `count` times"""
+        if count <= 0:
+            return
+        if value > MIN_INDEXABLE_VALUE:
+            key = self.get_key(value)
+            self.positive[key] = self.positive.get(key, 0) + count
+        elif value < -MIN_INDEXABLE_VALUE:
+            key = self.get_key(-value)
+            self.negative[key] = self.negative.get(key, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def merge(self, other):
+        """Add another sketch of the same accuracy into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        for key, count in other.positive.items():
+            self.positive[key] = self.positive.get(key, 0) + count
+        for key, count in other.negative.items():
+            self.negative[key] = self.negative.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None for an empty sketch"""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        cumulative = 0
+        # Most negative values first: larger keys of the negative store are further from zero
+        for key in sorted(self.negative, reverse=True):
+            cumulative += self.negative[key]
+            if cumulative > rank:
+                return -self.get_value(key)
+
+        cumulative += self.zero_count
+        if cumulative > rank:
+            return 0.0
+
+        for key in sorted(self.positive):
+            cumulative += self.positive[key]
+            if cumulative > rank:
+                return self.get_value(key)
+        return self.get_value(max(self.positive))
+
+    def as_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(key): count for key, count in self.positive.items()},
+            "negative": {str(key): count for key, count in self.negative.items()},
+            "zero_count": self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get("relative_accuracy") or DEFAULT_RELATIVE_ACCURACY)
+        sketch.positive = {int(key): count for key, count in (data.get("positive") or {}).items()}
+        sketch.negative = {int(key): count for key, count in (data.get("negative") or {}).items()}
+        sketch.zero_count = data.get("zero_count") or 0
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
@@ -0,0 +1,119 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+"Customers also bought" lookups for Sales Order and POS.
+
+calculate_market_basket ranks the top-K consequents of every item in the rule
+generation it writes (Item Basket Analysis.recommendation_rank). Lookups go
+through an in-process LRU, then a Redis hash per generation, then one indexed
+query for whatever is still missing. All cache keys carry the rule generation,
+so publishing a new generation invalidates every layer at once.
+"""
+
+from collections import OrderedDict
+
+import frappe
+from frappe.utils import cint, flt
+
+from erfmpnext.erfmpnext.api import get_basket_generation
+from erfmpnext.erfmpnext.association import merge_recommendations
+
+# Items whose recommendations each worker keeps in memory
+LRU_SIZE = 10_000
+
+# Seconds a generation's Redis hash lives
+REDIS_TTL = 24 * 60 * 60
+
+# Recommendations returned when the caller does not ask for a number
+DEFAULT_LIMIT = 10
+
+# Basket items looked up per call
+MAX_BASKET_ITEMS = 100
+
+# Ranked recommendations of some items in one rule generation
+RECOMMENDATION_QUERY = """
+    SELECT item_a, item_b, item_b_name, confidence, lift, recommendation_rank
+    FROM `tabItem Basket Analysis`
+    WHERE generation = %(generation)s AND item_a IN %(items)s AND recommendation_rank > 0
+    ORDER BY item_a, recommendation_rank
+"""
+
+# (site, generation, item) -> recommendations of the item
+_lru = OrderedDict()
+
+
+def get_redis_key(generation):
+    return f"erfmpnext:recommendations:{generation}"
+
+
+def get_from_lru(key):
+    if key in _lru:
+        _lru.move_to_end(key)
+        return _lru[key]
+
+
+def put_in_lru(key, value):
+    _lru[key] = value
+    _lru.move_to_end(key)
+    while len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def get_item_recommendations(items, generation):
+    """Ranked recommendations of each item: {item: [{item_code, item_name, confidence, lift, rank}]}"""
+    site = frappe.local.site
+    found = {}
+    missing = []
+    for item in items:
+        cached = get_from_lru((site, generation, item))
+        if cached is None:
+            cached = frappe.cache.hget(get_redis_key(generation), item)
+            if cached is not None:
+                put_in_lru((site, generation, item), cached)
+        if cached is None:
+            missing.append(item)
+        else:
+            found[item] = cached
+
+    if not missing:
+        return found
+
+    loaded = {item: [] for item in missing}
+    for row in frappe.db.sql(RECOMMENDATION_QUERY, {"generation": generation, "items": missing}, as_dict=True):
+        loaded[row.item_a].append({
+            "item_code": row.item_b,
+            "item_name": row.item_b_name,
+            "confidence": flt(row.confidence),
+            "lift": flt(row.lift),
+            "rank": row.recommendation_rank,
+        })
+
+    # Items without rules are cached too, as empty lists
+    for item, recommendations in loaded.items():
+        frappe.cache.hset(get_redis_key(generation), item, recommendations)
+        put_in_lru((site, generation, item), recommendations)
+    frappe.cache.expire(frappe.cache.make_key(get_redis_key(generation)), REDIS_TTL)
+
+    found.update(loaded)
+    return found
+
+
+@frappe.whitelist()
+def get_recommendations(items, limit=DEFAULT_LIMIT):
+    """Items customers also bought with the given basket items, best first"""
+    frappe.has_permission("Item", "read", throw=True)
+    if isinstance(items, str):
+        items = frappe.parse_json(items)
+    basket = list(dict.fromkeys(item for item in items or [] if item))[:MAX_BASKET_ITEMS]
+    if not basket:
+        return []
+
+    # Merge by the metric the generation was ranked with, not a setting changed since
+    generation, metric = get_basket_generation(with_metric=True)
+    return merge_recommendations(
+        basket,
+        get_item_recommendations(basket, generation),
+        metric,
+        cint(limit) or DEFAULT_LIMIT,
+    )
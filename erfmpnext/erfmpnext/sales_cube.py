@@ -0,0 +1,114 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+Item x month sales cube: revenue, qty, invoice count and line count per item per month.
+
+Sales Invoice submit adds the invoice's lines to their item-months and cancel
+subtracts them again, so product analytics reads at most twelve rows per item
+instead of scanning a year of invoice lines. Rows are keyed by a unique
+(item_code, month) index and named by a hash of that key, so long item codes
+always fit the name column. Rebuild everything with:
+    bench --site <site> execute erfmpnext.erfmpnext.sales_cube.rebuild_sales_cube
+"""
+
+import hashlib
+
+import frappe
+from frappe.utils import flt, getdate, now_datetime
+
+CUBE_COLUMNS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx",
+    "item_code", "month", "revenue", "qty", "invoice_count", "line_count",
+)
+
+
+# Unique key of Item Monthly Sales, which the cube writes upsert on
+CUBE_UNIQUE_KEY = ("item_code", "month")
+
+
+def get_cube_name(item_code, month):
+    """Bounded name of an item-month; matches the SHA1 rebuild_sales_cube computes in SQL"""
+    return "ITEM-SALES-" + hashlib.sha1(f"{item_code}|{month}".encode()).hexdigest()
+
+
+def add_cube_unique_key():
+    """Unique (item_code, month) index of Item Monthly Sales (skipped when it exists)"""
+    frappe.db.add_unique("Item Monthly Sales", list(CUBE_UNIQUE_KEY), "erfm_item_month_unique")
+
+
+def apply_invoice_delta(doc, sign):
+    """Add (sign=1) or subtract (sign=-1) an invoice's lines in the cube (no commit)"""
+    month = getdate(doc.posting_date).replace(day=1)
+    deltas = {}
+    for line in doc.items:
+        if not line.item_code:
+            continue
+        delta = deltas.setdefault(line.item_code, [0.0, 0.0, 0])
+        delta[0] += flt(line.base_net_amount)
+        delta[1] += flt(line.qty)
+        delta[2] += 1
+
+    if not deltas:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for item_code, (revenue, qty, lines) in deltas.items():
+        values.extend([
+            get_cube_name(item_code, month), user, now, now, user, 0, 0,
+            item_code, month, sign * revenue, sign * qty, sign, sign * lines,
+        ])
+
+    row_placeholder = "(" + ", ".join(["%s"] * len(CUBE_COLUMNS)) + ")"
+    # Increments are applied atomically, so concurrent invoices of an item-month add up
+    frappe.db.sql(f"""
+        INSERT INTO `tabItem Monthly Sales` ({", ".join(CUBE_COLUMNS)})
+        VALUES {", ".join([row_placeholder] * len(deltas))}
+        ON DUPLICATE KEY UPDATE
+            revenue = revenue + VALUES(revenue),
+            qty = qty + VALUES(qty),
+            invoice_count = invoice_count + VALUES(invoice_count),
+            line_count = line_count + VALUES(line_count),
+            modified = VALUES(modified)
+    """, values)
+
+    if sign < 0:
+        frappe.db.sql("""
+            DELETE FROM `tabItem Monthly Sales`
+            WHERE month = %(month)s AND item_code IN %(items)s AND line_count <= 0
+        """, {"month": month, "items": list(deltas)})
+
+
+def on_sales_invoice_submit(doc, method=None):
+    """doc_events hook for Sales Invoice on_submit"""
+    apply_invoice_delta(doc, 1)
+
+
+def on_sales_invoice_cancel(doc, method=None):
+    """doc_events hook for Sales Invoice on_cancel"""
+    apply_invoice_delta(doc, -1)
+
+
+def rebuild_sales_cube():
+    """Maintenance command: rebuild every Item Monthly Sales row from the submitted Sales Invoices"""
+    frappe.db.delete("Item Monthly Sales")
+    frappe.db.sql(f"""
+        INSERT INTO `tabItem Monthly Sales` ({", ".join(CUBE_COLUMNS)})
+        SELECT
+            CONCAT('ITEM-SALES-', SHA1(CONCAT(sii.item_code, '|', DATE_FORMAT(si.posting_date, '%%Y-%%m-01')))),
+            %(user)s, %(now)s, %(now)s, %(user)s, 0, 0,
+            sii.item_code,
+            DATE_FORMAT(si.posting_date, '%%Y-%%m-01') as month,
+            SUM(sii.base_net_amount),
+            SUM(sii.qty),
+            COUNT(DISTINCT sii.parent),
+            COUNT(*)
+        FROM `tabSales Invoice Item` sii
+        JOIN `tabSales Invoice` si ON sii.parent = si.name
+        WHERE si.docstatus = 1 AND sii.item_code IS NOT NULL
+        GROUP BY sii.item_code, month
+    """, {"user": frappe.session.user, "now": now_datetime()})
+    frappe.db.commit()
+    return {"rows": frappe.db.count("Item Monthly Sales")}
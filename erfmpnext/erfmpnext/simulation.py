@@ -0,0 +1,165 @@
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+"""
+What-if simulation of the RFM Settings thresholds.
+
+The Customer RFM Features store is loaded once per day into flat numpy vectors
+by a background job (after the nightly scoring and every full scoring run), and
+cached in Redis until a full scoring run refreshes every customer's features
+(queue rescores in between show up the next day), so scoring every customer
+under candidate thresholds is a handful of array operations. The endpoint only
+reads that cache.
+Nothing is written: the simulator only reports how the segment distribution
+would move, including the old bucket -> new bucket migration matrix.
+"""
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import cint, flt, getdate, nowdate
+
+from erfmpnext.erfmpnext.api import FEATURES_CACHE, SEGMENT_LABELS, get_rfm_thresholds
+from erfmpnext.erfmpnext.cache import get_cached_value, set_cached_value
+from erfmpnext.erfmpnext.doctype.rfm_settings.rfm_settings import THRESHOLD_FIELDS
+from erfmpnext.erfmpnext.orchestrator import enqueue_job
+from erfmpnext.erfmpnext.profiling import instrumented_job
+from erfmpnext.erfmpnext.scoring import get_invoice_days_late, score_feature_vectors
+
+# Average-score buckets, best first, as rows/columns of the migration matrix
+BUCKETS = (5, 4, 3, 2, 1)
+
+# Scores reported per component distribution
+COMPONENTS = ("recency", "frequency", "monetary", "payment")
+
+# Seconds the feature vectors of a day stay cached
+VECTORS_TTL = 24 * 60 * 60
+
+
+def get_feature_vectors(today=None):
+    """Cached feature vectors of every customer as of `today`; None (and a warming job queued) on a miss"""
+    today = getdate(today or nowdate())
+    vectors = get_cached_value(FEATURES_CACHE, f"vectors:{today}")
+    if vectors is None:
+        enqueue_job("simulation_vectors")
+    return vectors
+
+
+@instrumented_job("warm_feature_vectors")
+def warm_feature_vectors():
+    """Build and cache today's feature vectors (background job)"""
+    today = getdate(nowdate())
+    vectors = build_feature_vectors(today)
+    set_cached_value(FEATURES_CACHE, f"vectors:{today}", vectors, VECTORS_TTL)
+    return {"processed": vectors["customers"]}
+
+
+def build_feature_vectors(today):
+    """Flatten the Customer RFM Features store into the vectors score_feature_vectors reads"""
+    rows = frappe.db.sql("""
+        SELECT last_purchase_date, order_count, total_spent, settled_days_late, open_due_dates
+        FROM `tabCustomer RFM Features`
+        ORDER BY customer
+    """, as_dict=True)
+
+    invoice_customer = []
+    invoice_days_late = []
+    for i, row in enumerate(rows):
+        days_late = get_invoice_days_late({
+            "settled_days_late": frappe.parse_json(row.settled_days_late or "{}"),
+            "open_due_dates": frappe.parse_json(row.open_due_dates or "{}"),
+        }, today)
+        invoice_customer.extend([i] * len(days_late))
+        invoice_days_late.extend(days_late)
+
+    return {
+        "customers": len(rows),
+        "days_since": np.array([
+            (today - getdate(row.last_purchase_date)).days if row.last_purchase_date else 9999  # Never purchased
+            for row in rows
+        ], dtype=float),
+        "orders": np.array([row.order_count or 0 for row in rows], dtype=float),
+        "spent": np.array([flt(row.total_spent) for row in rows], dtype=float),
+        "invoice_customer": np.array(invoice_customer, dtype=np.intp),
+        "invoice_days_late": np.array(invoice_days_late, dtype=float),
+    }
+
+
+def get_candidate_settings(settings, candidate):
+    """RFM Settings values with the candidate threshold fields applied"""
+    unknown = set(candidate) - set(THRESHOLD_FIELDS)
+    if unknown:
+        frappe.throw(_("Unknown threshold fields: {0}").format(", ".join(sorted(unknown))))
+
+    values = frappe._dict({field: settings.get(field) for field in THRESHOLD_FIELDS})
+    for field, value in candidate.items():
+        if value in (None, ""):
+            values[field] = None
+        else:
+            values[field] = flt(value) if field.startswith("monetary_") else cint(value)
+    return values
+
+
+def count_by_score(scores):
+    """Customer count per score 5..1 (rounded down for the fractional payment score)"""
+    counts = np.bincount(np.clip(np.floor(scores), 1, 5).astype(int), minlength=6)
+    return [int(counts[score]) for score in BUCKETS]
+
+
+@frappe.whitelist()
+def simulate_thresholds(thresholds):
+    """
+    Score every customer under candidate thresholds without writing anything.
+    `thresholds` maps RFM Settings threshold fields (e.g. recency_days_5) to
+    candidate values; fields left out keep their current value.
+    """
+    frappe.has_permission("RFM Settings", "read", throw=True)
+    candidate = frappe.parse_json(thresholds) if isinstance(thresholds, str) else thresholds
+
+    settings = frappe.get_single("RFM Settings")
+    current_thresholds = get_rfm_thresholds(settings)
+    candidate_thresholds = get_rfm_thresholds(get_candidate_settings(settings, candidate or {}))
+
+    vectors = get_feature_vectors()
+    if vectors is None:
+        return {"ready": False, "message": _("Customer features are being loaded, try again in a few minutes.")}
+
+    current = score_feature_vectors(vectors, current_thresholds)
+    simulated = score_feature_vectors(vectors, candidate_thresholds)
+
+    # migration[i][j]: customers moving from BUCKETS[i] to BUCKETS[j]
+    migration = np.bincount(
+        (5 - current["bucket"]) * len(BUCKETS) + (5 - simulated["bucket"]),
+        minlength=len(BUCKETS) ** 2,
+    ).reshape(len(BUCKETS), len(BUCKETS))
+
+    current_counts = migration.sum(axis=1)
+    simulated_counts = migration.sum(axis=0)
+
+    return {
+        "ready": True,
+        "customers": vectors["customers"],
+        "thresholds": {"current": current_thresholds, "simulated": candidate_thresholds},
+        "distribution": [
+            {
+                "segment": SEGMENT_LABELS[bucket],
+                "score_bucket": bucket,
+                "current": int(current_counts[i]),
+                "simulated": int(simulated_counts[i]),
+            }
+            for i, bucket in enumerate(BUCKETS)
+        ],
+        "migration": {
+            "segments": [SEGMENT_LABELS[bucket] for bucket in BUCKETS],
+            "counts": migration.tolist(),
+        },
+        "components": {
+            component: {"current": count_by_score(current[component]), "simulated": count_by_score(simulated[component])}
+            for component in COMPONENTS
+        },
+        "changed": int(np.count_nonzero(current["average"] != simulated["average"])),
+        "avg_score": {
+            "current": round(float(current["average"].mean()), 2) if vectors["customers"] else None,
+            "simulated": round(float(simulated["average"].mean()), 2) if vectors["customers"] else None,
+        },
+    }
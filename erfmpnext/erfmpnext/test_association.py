@@ -0,0 +1,153 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+import random
+import unittest
+from itertools import combinations
+
+from erfmpnext.erfmpnext.association import (
+	CounterBudgetExceeded,
+	count_itemsets,
+	count_pairs,
+	get_pair_rules,
+	merge_recommendations,
+	rank_consequents,
+)
+
+
+def recommendation(item_code, confidence, lift):
+	return {"item_code": item_code, "item_name": item_code.title(), "confidence": confidence, "lift": lift}
+
+
+class TestPairCounting(unittest.TestCase):
+	def setUp(self):
+		rng = random.Random(11)
+		self.n = 12
+		self.baskets = [tuple(sorted(rng.sample(range(self.n), rng.randint(2, 6)))) for _ in range(500)]
+
+		self.expected = {}
+		for basket in self.baskets:
+			for a, b in combinations(basket, 2):
+				self.expected[a * self.n + b] = self.expected.get(a * self.n + b, 0) + 1
+
+	def test_counts_every_pair(self):
+		self.assertEqual(count_pairs(lambda: iter(self.baskets), self.n, 1), self.expected)
+
+	def test_min_support(self):
+		frequent = {key: c for key, c in self.expected.items() if c >= 40}
+		self.assertEqual(count_pairs(lambda: iter(self.baskets), self.n, 40), frequent)
+
+	def test_partitions_on_overflow(self):
+		splits = []
+		counts = count_pairs(lambda: iter(self.baskets), self.n, 1, max_counters=20, on_split=splits.append)
+		self.assertEqual(counts, self.expected)
+		self.assertEqual(splits, sorted(splits))
+		self.assertTrue(splits)
+
+	def test_budget_too_small(self):
+		with self.assertRaises(CounterBudgetExceeded):
+			count_pairs(lambda: iter(self.baskets), self.n, 1, max_counters=2)
+
+
+	def count_exact(self, size, min_support_count):
+		counts = {}
+		for basket in self.baskets:
+			for itemset in combinations(basket, size):
+				counts[itemset] = counts.get(itemset, 0) + 1
+		return {itemset: c for itemset, c in counts.items() if c >= min_support_count}
+
+	def test_apriori_levels(self):
+		min_support = 12
+		frequent = {(key // self.n, key % self.n) for key in count_pairs(lambda: iter(self.baskets), self.n, min_support)}
+		for size in (3, 4):
+			counts = count_itemsets(lambda: iter(self.baskets), frequent, size, min_support)
+			self.assertEqual(counts, self.count_exact(size, min_support), size)
+			frequent = set(counts)
+		self.assertTrue(self.count_exact(3, min_support))
+
+	def test_apriori_budget(self):
+		frequent = set(self.count_exact(2, 1))
+		with self.assertRaises(CounterBudgetExceeded):
+			count_itemsets(lambda: iter(self.baskets), frequent, 3, 1, max_counters=10)
+		self.assertEqual(count_itemsets(lambda: iter(self.baskets), set(), 3, 1), {})
+
+
+class TestRecommendations(unittest.TestCase):
+	def test_pair_rules(self):
+		rules = list(get_pair_rules(10, {"A": 5, "B": 4}, {("A", "B"): 2}))
+		self.assertEqual([rule[:2] for rule in rules], [("A", "B"), ("B", "A")])
+		self.assertAlmostEqual(rules[0][2], 20.0)
+		self.assertAlmostEqual(rules[0][3], 40.0)
+		self.assertAlmostEqual(rules[1][3], 50.0)
+		self.assertAlmostEqual(rules[0][4], 0.2 / (0.5 * 0.4))
+		self.assertEqual(rules[0][4], rules[1][4])
+
+	def test_rank_consequents(self):
+		# (a, b, support, confidence, lift, count)
+		rules = [
+			("A", "B", 1, 40, 2.0, 4),
+			("A", "C", 1, 60, 2.0, 4),  # Lift tie: higher confidence first
+			("A", "D", 1, 60, 2.0, 4),  # Full tie: consequent code
+			("A", "E", 1, 90, 1.5, 4),
+			("B", "A", 1, 10, 2.0, 4),
+		]
+		self.assertEqual(rank_consequents(rules, 10), [3, 1, 2, 4, 1])
+		self.assertEqual(rank_consequents(rules, 10, "Confidence"), [4, 2, 3, 1, 1])
+
+	def test_rank_consequents_top_k(self):
+		rules = [("A", item, 1, 50, lift, 4) for item, lift in [("B", 1.2), ("C", 3.0), ("D", 2.0)]]
+		self.assertEqual(rank_consequents(rules, 2), [0, 1, 2])
+		self.assertEqual(rank_consequents(rules, 0), [0, 0, 0])
+
+	def test_merge_drops_basket_items(self):
+		merged = merge_recommendations(["A", "B"], {
+			"A": [recommendation("B", 80, 3.0), recommendation("C", 50, 1.5)],
+			"B": [recommendation("A", 70, 3.0)],
+		})
+		self.assertEqual([entry["item_code"] for entry in merged], ["C"])
+		self.assertEqual(merged[0]["because_of"], ["A"])
+
+	def test_merge_adds_scores(self):
+		merged = merge_recommendations(["A", "B"], {
+			"A": [recommendation("C", 50, 1.5), recommendation("D", 90, 2.5)],
+			"B": [recommendation("C", 30, 1.5)],
+		})
+		self.assertEqual([entry["item_code"] for entry in merged], ["C", "D"])
+		self.assertEqual(merged[0]["score"], 3.0)
+		self.assertEqual(merged[0]["confidence"], 50)
+		self.assertEqual(merged[0]["because_of"], ["A", "B"])
+
+		by_confidence = merge_recommendations(["A", "B"], {
+			"A": [recommendation("C", 50, 1.5), recommendation("D", 90, 2.5)],
+			"B": [recommendation("C", 30, 1.5)],
+		}, metric="Confidence")
+		self.assertEqual([entry["score"] for entry in by_confidence], [90, 80])
+
+	def test_merge_ties_and_limit(self):
+		merged = merge_recommendations(["A", "B"], {
+			"A": [recommendation("E", 50, 2.0), recommendation("D", 50, 1.0)],
+			"B": [recommendation("D", 50, 1.0), recommendation("C", 50, 2.0)],
+		}, limit=2)
+		# Equal scores: recommended by more basket items first, then by item code
+		self.assertEqual([entry["item_code"] for entry in merged], ["D", "C"])
+		self.assertEqual(len(merge_recommendations(["A"], {"A": [recommendation("B", 1, 1)]}, limit=0)), 0)
+
+	def test_ranked_index_to_basket(self):
+		# (a, b, support, confidence, lift, count)
+		rules = [
+			("A", "B", 1, 90, 1.1, 4),
+			("A", "C", 1, 20, 4.0, 4),
+			("A", "D", 1, 50, 2.0, 4),
+			("B", "D", 1, 30, 3.0, 4),
+			("B", "A", 1, 95, 1.1, 4),
+		]
+		for metric, expected in (("Lift", ["D", "C"]), ("Confidence", ["D"])):
+			# What the recommendation index keeps: the top 2 per item, best first (C misses the cut by confidence)
+			ranks = rank_consequents(rules, 2, metric)
+			by_item = {}
+			for rule, rank in sorted(zip(rules, ranks, strict=True), key=lambda pair: pair[1]):
+				if rank:
+					by_item.setdefault(rule[0], []).append(recommendation(rule[1], rule[3], rule[4]))
+
+			merged = merge_recommendations(["A", "B"], by_item, metric)
+			self.assertEqual([entry["item_code"] for entry in merged], expected, metric)
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+import random
+import unittest
+
+from erfmpnext.erfmpnext.quantiles import QuantileSketch
+
+
+def exact_quantile(values, q):
+	"""Value of rank q * (n - 1) in the sorted values"""
+	return sorted(values)[int(q * (len(values) - 1))]
+
+
+class TestQuantileSketch(unittest.TestCase):
+	quantiles = (0.0, 0.2, 0.4, 0.5, 0.6, 0.8, 1.0)
+
+	def setUp(self):
+		rng = random.Random(7)
+		# Days late: early, on time and late payments around zero
+		self.values = [rng.randint(-30, 120) for _ in range(20000)] + [0] * 3000 + [rng.lognormvariate(8, 2) for _ in range(5000)]
+
+	def assert_close(self, sketch, values):
+		for q in self.quantiles:
+			expected = exact_quantile(values, q)
+			self.assertLessEqual(abs(sketch.quantile(q) - expected), abs(expected) * sketch.relative_accuracy + 1e-9, q)
+
+	def test_relative_accuracy(self):
+		sketch = QuantileSketch()
+		for value in self.values:
+			sketch.add(value)
+		self.assertEqual(sketch.count, len(self.values))
+		self.assert_close(sketch, self.values)
+
+	def test_merged_shards_match_one_pass(self):
+		single = QuantileSketch()
+		for value in self.values:
+			single.add(value)
+
+		shards = [QuantileSketch() for _ in range(4)]
+		for i, value in enumerate(self.values):
+			shards[i % 4].add(value)
+		merged = QuantileSketch()
+		for shard in shards:
+			merged.merge(QuantileSketch.from_dict(shard.as_dict()))
+
+		self.assertEqual(merged.count, single.count)
+		self.assertEqual([merged.quantile(q) for q in self.quantiles], [single.quantile(q) for q in self.quantiles])
+
+	def test_weighted_add(self):
+		weighted, repeated = QuantileSketch(), QuantileSketch()
+		for value, count in [(-5, 3), (0, 2), (14, 10), (40, 1)]:
+			weighted.add(value, count)
+			for _ in range(count):
+				repeated.add(value)
+		self.assertEqual([weighted.quantile(q) for q in self.quantiles], [repeated.quantile(q) for q in self.quantiles])
+
+	def test_empty(self):
+		self.assertIsNone(QuantileSketch().quantile(0.5))
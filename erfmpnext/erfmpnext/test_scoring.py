@@ -0,0 +1,131 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+import json
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+
+from erfmpnext.erfmpnext.scoring import (
+	get_invoice_days_late,
+	get_invoice_payment_features,
+	score_array,
+	score_feature_vectors,
+	score_value,
+	summarize_days_late,
+)
+
+
+def reference_score(value, thresholds, reverse=False):
+	"""The original per-value threshold loop"""
+	for i, threshold in enumerate(thresholds):
+		if (value >= threshold) if reverse else (value <= threshold):
+			return 5 - i
+	return 1
+
+
+def reference_days_late(invoices, payment_terms_days, last_payment_dates, today):
+	"""The original single pass over a customer's invoices"""
+	days_late_list = []
+	for inv in invoices:
+		due_date = inv["due_date"] or inv["posting_date"] + timedelta(days=payment_terms_days)
+		if inv["outstanding_amount"] <= 0.1:
+			effective_payment_date = last_payment_dates.get(inv["name"]) or inv["posting_date"]
+			days_late_list.append((effective_payment_date - due_date).days)
+		elif today >= due_date:
+			days_late_list.append((today - due_date).days)
+	return days_late_list
+
+
+class TestScoringKernel(unittest.TestCase):
+	threshold_sets = (
+		([30, 60, 90, 180], False),
+		([-7, 7, 30, 60], False),
+		([10, 5, 3, 2], True),
+		([50000.0, 25000.0, 10000.0, 2000.0], True),
+		# Misconfigured (unsorted) thresholds must keep the first-match semantics
+		([60, 30, 90, 10], False),
+		([3, 10, 2, 5], True),
+	)
+
+	def test_matches_reference_loop(self):
+		values = [-30, -8, -7, -6, 0, 1, 2, 3, 5, 7, 9.5, 10, 11, 29, 30, 31, 60, 61, 180, 181, 2000, 9999, 50000]
+		for thresholds, reverse in self.threshold_sets:
+			expected = [reference_score(v, thresholds, reverse) for v in values]
+			self.assertEqual(score_array(values, thresholds, reverse).tolist(), expected)
+			self.assertEqual([score_value(v, thresholds, reverse) for v in values], expected)
+
+	def test_summarize_days_late(self):
+		counts, score_sums, days_late_sums, late_counts = summarize_days_late(
+			[0, 0, 2], [-10, 40, 0], 3, [-7, 7, 30, 60]
+		)
+		self.assertEqual(counts.tolist(), [2, 0, 1])
+		self.assertEqual(score_sums.tolist(), [5 + 2, 0, 4])
+		self.assertEqual(days_late_sums.tolist(), [30, 0, 0])
+		self.assertEqual(late_counts.tolist(), [1, 0, 0])
+
+	def test_score_feature_vectors(self):
+		thresholds = {
+			"recency": [30, 60, 90, 180],
+			"frequency": [10, 5, 3, 2],
+			"monetary": [50000, 25000, 10000, 2000],
+			"payment": [-7, 7, 30, 60],
+		}
+		days_since = [5, 45, 400, 9999]
+		orders = [12, 4, 1, 0]
+		spent = [60000, 12000, 500, 0]
+		invoices = {0: [-10, 3, 8], 1: [45], 2: [], 3: []}
+
+		scores = score_feature_vectors({
+			"days_since": np.array(days_since, dtype=float),
+			"orders": np.array(orders, dtype=float),
+			"spent": np.array(spent, dtype=float),
+			"invoice_customer": np.array([i for i, days in invoices.items() for _ in days], dtype=np.intp),
+			"invoice_days_late": np.array([d for days in invoices.values() for d in days], dtype=float),
+		}, thresholds)
+
+		# Row-by-row scoring as in score_chunk / score_payment_features
+		for i in range(len(days_since)):
+			r = score_value(days_since[i], thresholds["recency"])
+			f = score_value(orders[i], thresholds["frequency"], reverse=True)
+			m = score_value(spent[i], thresholds["monetary"], reverse=True)
+			invoice_scores = [score_value(d, thresholds["payment"]) for d in invoices[i]]
+			p = round(sum(invoice_scores) / len(invoice_scores), 1) if invoice_scores else 5
+			average = round((r + f + m + p) / 4, 1)
+			self.assertEqual(scores["payment"][i], p)
+			self.assertEqual(scores["average"][i], average)
+			self.assertEqual(scores["bucket"][i], max(1, min(5, int(average))))
+
+	def test_payment_features_match_single_pass(self):
+		today = date(2026, 10, 17)
+		invoices = [
+			# Paid early, on time and late
+			{"name": "INV-1", "posting_date": date(2026, 1, 5), "due_date": date(2026, 2, 4), "outstanding_amount": 0},
+			{"name": "INV-2", "posting_date": date(2026, 3, 1), "due_date": date(2026, 3, 31), "outstanding_amount": 0.05},
+			{"name": "INV-3", "posting_date": date(2026, 4, 1), "due_date": None, "outstanding_amount": 0},
+			# Paid without a Payment Entry: falls back to the posting date
+			{"name": "INV-4", "posting_date": date(2026, 5, 1), "due_date": date(2026, 5, 31), "outstanding_amount": 0},
+			# Open: overdue, due today, not yet due, and due from the terms
+			{"name": "INV-5", "posting_date": date(2026, 6, 1), "due_date": date(2026, 7, 1), "outstanding_amount": 100},
+			{"name": "INV-6", "posting_date": date(2026, 9, 17), "due_date": today, "outstanding_amount": 50},
+			{"name": "INV-7", "posting_date": date(2026, 10, 1), "due_date": date(2026, 10, 31), "outstanding_amount": 80},
+			{"name": "INV-8", "posting_date": date(2026, 8, 1), "due_date": None, "outstanding_amount": 20},
+			{"name": "INV-9", "posting_date": date(2026, 7, 1), "due_date": date(2026, 7, 1), "outstanding_amount": 100},
+		]
+		last_payment_dates = {
+			"INV-1": date(2026, 1, 30),
+			"INV-2": date(2026, 3, 31),
+			"INV-3": date(2026, 6, 15),
+		}
+
+		expected = sorted(reference_days_late(invoices, 30, last_payment_dates, today))
+		settled_days_late, open_due_dates = get_invoice_payment_features(invoices, 30, last_payment_dates)
+		features = {"settled_days_late": settled_days_late, "open_due_dates": open_due_dates}
+		self.assertEqual(sorted(get_invoice_days_late(features, today)), expected)
+
+		# Stored as JSON in Customer RFM Features: days_late keys come back as strings
+		stored = json.loads(json.dumps(features, separators=(",", ":")))
+		self.assertEqual(set(stored["settled_days_late"]), {str(key) for key in settled_days_late})
+		self.assertEqual(sorted(get_invoice_days_late(stored, today)), expected)
+		self.assertEqual(sorted(get_invoice_days_late(stored, str(today))), expected)
@@ -25,7 +25,7 @@ add_to_apps_screen = [
 
 # include js, css files in header of desk.html
 # app_include_css = "/assets/erfmpnext/css/erfmpnext.css"
-# app_include_js = "/assets/erfmpnext/js/erfmpnext.js"
+app_include_js = "/assets/erfmpnext/js/analytics_jobs.js"
 
 # include js, css files in header of web template
 # web_include_css = "/assets/erfmpnext/css/erfmpnext.css"
@@ -136,23 +136,37 @@ add_to_apps_screen = [
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"Sales Invoice": {
+		"on_submit": [
+			"erfmpnext.erfmpnext.customer_facts.on_sales_invoice_change",
+			"erfmpnext.erfmpnext.sales_cube.on_sales_invoice_submit",
+			"erfmpnext.erfmpnext.incremental.on_sales_invoice_change"
+		],
+		"on_cancel": [
+			"erfmpnext.erfmpnext.customer_facts.on_sales_invoice_change",
+			"erfmpnext.erfmpnext.sales_cube.on_sales_invoice_cancel",
+			"erfmpnext.erfmpnext.incremental.on_sales_invoice_change"
+		]
+	},
+	"Payment Entry": {
+		"on_submit": "erfmpnext.erfmpnext.incremental.on_payment_entry_change",
+		"on_cancel": "erfmpnext.erfmpnext.incremental.on_payment_entry_change"
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
 	"cron": {
+		"*/5 * * * *": [
+			"erfmpnext.erfmpnext.orchestrator.run_rescore_queue"
+		],
+		# Nightly pipeline: scoring (a full reconciliation on Sundays), then the history
+		# snapshot, with product analytics alongside; see orchestrator.py
 		"0 8 * * *": [
-			"erfmpnext.erfmpnext.api.calculate_rfm_scores",
-			"erfmpnext.erfmpnext.api.create_history_snapshot",
-			"erfmpnext.erfmpnext.api.calculate_product_analytics"
+			"erfmpnext.erfmpnext.orchestrator.run_nightly_analytics"
 		]
 	}
 }
@@ -229,7 +243,7 @@ scheduler_events = {
 # Automatically update python controller files with type annotations for this app.
 # export_python_type_annotations = True
 
-# default_log_clearing_doctypes = {
-# 	"Logging DocType Name": 30  # days to retain logs
-# }
+default_log_clearing_doctypes = {
+	"Analytics Run Log": 30  # days to retain logs
+}
 
@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+	"""Index backing the per-customer, per-day RFM Alert deduplication"""
+	frappe.db.add_index("RFM Alert", ["customer", "created_on"], "erfm_alert_customer_date")
@@ -0,0 +1,6 @@
+from erfmpnext.erfmpnext.indexes import ensure_analytics_indexes
+
+
+def execute():
+	"""Composite indexes for the RFM and product analytics access paths (idempotent)"""
+	ensure_analytics_indexes()
@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+	"""Index backing the per-item recommendation lookups"""
+	frappe.db.add_index("Item Basket Analysis", ["generation", "item_a", "recommendation_rank"], "erfm_generation_item_rank")
@@ -0,0 +1,17 @@
+import frappe
+
+from erfmpnext.erfmpnext.api import update_segment_rollup
+
+
+def execute():
+	"""Build RFM Segment Rollup rows for snapshots taken before rollups existed"""
+	snapshot_dates = frappe.db.sql_list("""
+		SELECT DISTINCT h.snapshot_date
+		FROM `tabRFM History` h
+		LEFT JOIN `tabRFM Segment Rollup` r ON r.snapshot_date = h.snapshot_date
+		WHERE r.name IS NULL
+	""")
+
+	for snapshot_date in snapshot_dates:
+		update_segment_rollup(str(snapshot_date))
+		frappe.db.commit()
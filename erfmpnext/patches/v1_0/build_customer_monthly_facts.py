@@ -0,0 +1,7 @@
+from erfmpnext.erfmpnext.customer_facts import add_fact_unique_key, rebuild_customer_facts
+
+
+def execute():
+	"""Index and fill Customer Monthly Fact from the existing Sales Invoices"""
+	rebuild_customer_facts()
+	add_fact_unique_key()
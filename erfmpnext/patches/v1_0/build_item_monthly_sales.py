@@ -0,0 +1,10 @@
+import frappe
+
+from erfmpnext.erfmpnext.sales_cube import add_cube_unique_key, rebuild_sales_cube
+
+
+def execute():
+	"""Index and fill the Item Monthly Sales cube from the existing Sales Invoices"""
+	frappe.db.add_index("Item Monthly Sales", ["month", "item_code"], "erfm_month_item")
+	rebuild_sales_cube()
+	add_cube_unique_key()
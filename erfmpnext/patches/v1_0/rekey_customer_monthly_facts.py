@@ -0,0 +1,11 @@
+import frappe
+
+from erfmpnext.erfmpnext.customer_facts import add_fact_unique_key, rebuild_customer_facts
+
+
+def execute():
+	"""Rename Customer Monthly Facts by hashed key and make (customer, month) unique"""
+	rebuild_customer_facts()
+	if frappe.db.has_index("tabCustomer Monthly Fact", "erfm_customer_month"):
+		frappe.db.sql("ALTER TABLE `tabCustomer Monthly Fact` DROP INDEX `erfm_customer_month`")
+	add_fact_unique_key()
@@ -0,0 +1,7 @@
+from erfmpnext.erfmpnext.sales_cube import add_cube_unique_key, rebuild_sales_cube
+
+
+def execute():
+	"""Rename Item Monthly Sales rows by hashed key and make (item_code, month) unique"""
+	rebuild_sales_cube()
+	add_cube_unique_key()
@@ -0,0 +1,52 @@
+// Start and follow erfmpnext analytics background jobs (see orchestrator.py)
+frappe.provide('erfmpnext');
+
+erfmpnext.run_analytics_job = function (method, job, title, on_done) {
+    frappe.call({
+        method: method,
+        callback: function (r) {
+            if (!r.message) return;
+            if (!r.message.queued) {
+                frappe.show_alert({ message: `${title} is already running.`, indicator: 'orange' });
+            }
+            erfmpnext.track_analytics_job(job, title, on_done);
+        }
+    });
+};
+
+// Show the progress a background analytics job publishes; call on_done once it finishes
+erfmpnext.track_analytics_job = function (job, title, on_done) {
+    frappe.show_progress(title, 0, 1, 'Queued');
+
+    const handler = function (data) {
+        if (data.job !== job) return;
+
+        if (data.status === 'Running') {
+            frappe.show_progress(title, data.processed || 0, data.total || 1, data.stage);
+            return;
+        }
+        if (data.status === 'Waiting') {
+            // Runs once the job holding its lock finishes
+            frappe.show_progress(title, 0, 1, data.stage);
+            return;
+        }
+        if (data.status === 'Skipped') {
+            // This run was dropped, but an earlier one is already waiting: follow that one
+            frappe.show_alert({ message: `${title} is already waiting to run.`, indicator: 'orange' });
+            frappe.show_progress(title, 0, 1, 'Waiting');
+            return;
+        }
+
+        frappe.realtime.off('erfmpnext_job_progress', handler);
+        frappe.hide_progress();
+
+        const completed = data.status === 'Completed';
+        const processed = data.processed != null ? ` Processed ${data.processed}.` : '';
+        frappe.show_alert({
+            message: completed ? `${title} finished.${processed}` : `${title} failed. See the Analytics Run Log.`,
+            indicator: completed ? 'green' : 'red'
+        });
+        if (on_done) on_done();
+    };
+    frappe.realtime.on('erfmpnext_job_progress', handler);
+};